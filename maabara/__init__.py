@@ -6,22 +6,23 @@ from maabara.data import *
 from maabara.latex import *
 
 def hr():
-    try:
-        import IPython.display
-        IPython.display.display(IPython.display.HTML('<hr />'))
-    except:
-        pass
+    display = ipython_display()
+    if (display is not None):
+        display.display(display.HTML('<hr />'))
     
 def print_ufloat(ufloat, name = '',layout = '{:.1uL}'):
     prefix = ""
     if name != "":
         prefix = name + " = "
 
-    tex = prefix + layout.format(ufloat)
+    if isinstance(ufloat, uc.UFloat):
+        tex = prefix + format_ufloat(ufloat.n, ufloat.s, layout)
+    else:
+        tex = prefix + layout.format(ufloat)
     
-    try:
-        import IPython.display
-        IPython.display.display((IPython.display.Math(tex)))
-    except:
+    display = ipython_display()
+    if (display is not None):
+        display.display(display.Math(tex))
+    else:
         logging.warn('Could not import IPython.display to render Latex')
     print tex + '\n'
\ No newline at end of file
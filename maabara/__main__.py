@@ -0,0 +1,148 @@
+"""
+
+Command line error propagation
+
+Propagates the uncertainty of an equation row by row through a data
+file or stdin, see :func:`~maabara.uncertainty.Sheet.batch`
+
+Examples
+--------
+>>> python -m maabara 'a*x**3' -f 'a|x|x%' -c a=,0.05 -i data.txt
+>>> cat data.txt | maabara 'a*x**3' -f '*|x|x%' -c a=1,0.05 --workers 4 > result.csv
+
+"""
+
+import sys
+import argparse
+import numpy as np
+
+from maabara.uncertainty import Sheet
+from maabara.data import load
+
+_formats = {'csv': ',', 'tsv': '\t', 'tex': None}
+
+def _constant(string):
+    # parse name=value,error where value or error may be omitted
+    try:
+        name, values = string.split('=', 1)
+        values = values.split(',')
+        value = float(values[0]) if values[0].strip() != '' else False
+        error = float(values[1]) if len(values) > 1 and values[1].strip() != '' else False
+    except ValueError:
+        raise argparse.ArgumentTypeError("Constants are given as name=value,error: " + string)
+
+    return name.strip(), value, error
+
+_sheets = {}
+
+def _batch(task):
+    # propagate one chunk, the sheet is reused within a process
+    equation, constants, fields, data = task
+
+    key = (equation, tuple(constants))
+    if (key not in _sheets):
+        sheet = Sheet(equation)
+        for name, value, error in constants:
+            sheet.set_value(name, value, error)
+        _sheets[key] = sheet
+
+    return _sheets[key].batch(data, fields)
+
+def _write(stream, result, format):
+    if (_formats[format] is None):
+        from maabara.latex import format_ufloats
+        stream.write(''.join([tex + '\n' for tex in format_ufloats(result[:,0], result[:,1])]))
+    else:
+        np.savetxt(stream, result, fmt='%r', delimiter=_formats[format])
+
+def _window(pool, tasks, size):
+    # results in order, at most size chunks are read ahead of the output
+    import collections
+    
+    pending = collections.deque()
+    for task in tasks:
+        pending.append(pool.apply_async(_batch, (task,)))
+        if (len(pending) >= size):
+            yield pending.popleft().get()
+    
+    while (len(pending) > 0):
+        yield pending.popleft().get()
+
+def main(args = None):
+    """
+
+    Runs the command line interface
+
+    Parameters
+    ----------
+    args : list of strings, optional
+        Command line arguments, by default ``sys.argv``
+
+    Returns
+    -------
+    out : int
+        Exit status
+
+    """
+    parser = argparse.ArgumentParser(prog='maabara',
+                                     description='Symbolic propagation of uncertainty row by row. '
+                                                 'Writes nominal value and deviation of every row.')
+    parser.add_argument('equation', help="Sympy equation string, e.g. 'a*x**3'")
+    parser.add_argument('-i', '--input', default='-',
+                        help="Data file, '-' reads from stdin (default)")
+    parser.add_argument('-f', '--fields', default=None,
+                        help="Column fields, e.g. 'a|x|x%%'. By default the header line of the input")
+    parser.add_argument('-c', '--constant', type=_constant, action='append', default=[],
+                        metavar='NAME=VALUE,ERROR',
+                        help="Constant value and error, either may be omitted, e.g. 'a=1.0,0.05' or 'a=,0.05'")
+    parser.add_argument('-o', '--output', default='-', help="Output file, '-' writes to stdout (default)")
+    parser.add_argument('--format', choices=sorted(_formats), default='csv',
+                        help="Output format, 'tex' writes Latex markup like 2.4 \\pm 0.7 (default: csv)")
+    parser.add_argument('--header', action='store_true', help="Write a header line")
+    parser.add_argument('--chunk', type=int, default=10000, help="Rows processed at once (default: 10000)")
+    parser.add_argument('--workers', type=int, default=1, help="Number of processes (default: 1)")
+    parser.add_argument('--delimiter', default=None, help="Column delimiter of the input, by default whitespace")
+    options = parser.parse_args(args)
+
+    if (options.chunk < 1 or options.workers < 1):
+        parser.error('chunk and workers must be positive')
+
+    source = sys.stdin if options.input == '-' else options.input
+    try:
+        chunks = load(source, options.fields, options.chunk, options.delimiter)
+        tasks = ((options.equation, options.constant, chunk.fields(), chunk.array()) for chunk in chunks)
+        stream = sys.stdout if options.output == '-' else open(options.output, 'w')
+    except IOError as e:
+        parser.error(str(e))
+
+    pool = None
+    if (options.workers > 1):
+        import multiprocessing
+        pool = multiprocessing.Pool(options.workers)
+        results = _window(pool, tasks, 2 * options.workers)
+    else:
+        import itertools
+        results = itertools.imap(_batch, tasks)
+
+    try:
+        if (options.header):
+            delimiter = _formats[options.format]
+            stream.write('value' + (delimiter + 'deviation' if delimiter else '') + '\n')
+
+        for result in results:
+            if (result is False):
+                parser.error('Fields do not match the columns of the input')
+            _write(stream, result, options.format)
+            stream.flush()
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    finally:
+        if (pool is not None):
+            pool.terminate()
+        if (stream is not sys.stdout):
+            stream.close()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
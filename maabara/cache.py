@@ -0,0 +1,422 @@
+"""
+
+Cache management
+
+All caches of maabara are regions of the module instance
+:data:`~maabara.cache.manager`. It enforces a global memory budget and
+an optional disk budget with least recently used eviction.
+
+Regions
+-------
+``derivations`` -- symbolic error equations of :class:`~maabara.uncertainty.Sheet`
+``kernels`` -- compiled model functions and tabulated t-factors
+``formats`` -- Latex markup of ufloats and equations
+``fits`` -- fit results, also stored on disk if a directory is set
+
+Examples
+--------
+>>> ma.cache.manager.directory = '.cache'
+>>> ma.cache.manager.stats()['formats']
+{'hits': 1520, 'misses': 80, 'evictions': 0, 'entries': 80, 'memory': 10880}
+>>> ma.cache.manager.disable()    # reproducible benchmarks
+
+"""
+
+import os
+import sys
+import types
+import collections
+import numpy as np
+
+class Cache(object):
+    """
+
+    Named region of a :class:`~maabara.cache.CacheManager`
+
+    Parameters
+    ----------
+    manager : CacheManager
+        Owner of the stored values
+    name : string
+        Region name
+    disk : boolean, optional
+        If True values are also stored in the directory of the manager
+
+    """
+
+    def __init__(self, manager, name, disk = False):
+        self.manager = manager
+        self.name = name
+        self.disk = disk
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+
+        Reset the hit, miss and eviction counters
+
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, *args):
+        """
+
+        Returns a hash of the given arguments, arrays are hashed by
+        content and functions by code and the values they depend on.
+        Raises ValueError if an argument has no stable representation.
+
+        """
+        import hashlib
+        digest = hashlib.sha1()
+        for arg in args:
+            _hash_update(digest, arg)
+
+        return digest.hexdigest()
+
+    def get(self, key, default = None):
+        """
+
+        Returns a stored value or ``default``
+
+        """
+        return self.manager._get(self, key, default)
+
+    def set(self, key, value):
+        """
+
+        Stores a value
+
+        Returns
+        -------
+        out : value
+        """
+        self.manager._set(self, key, value)
+
+        return value
+
+    def clear(self, disk = False):
+        """
+
+        Remove all values of the region from memory and optionally from disk
+
+        """
+        return self.manager.clear(self.name, disk)
+
+    def stats(self):
+        """
+
+        Returns the counters of the region
+
+        Returns
+        -------
+        out : dict
+            ``hits``, ``misses``, ``evictions``, ``entries`` and ``memory`` in bytes
+        """
+        entries = [size for (name, key), (value, size) in self.manager.entries.items()
+                   if name == self.name]
+
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(entries), 'memory': sum(entries)}
+
+class CacheManager(object):
+    """
+
+    Owner of all caches
+
+    Values of all regions share one least recently used order, the
+    oldest are evicted if the memory budget is exceeded. Sizes are
+    estimated with ``sys.getsizeof`` and ``ndarray.nbytes``.
+
+    Parameters
+    ----------
+    memory : int, optional
+        Memory budget in bytes
+    disk : int, optional
+        Disk budget in bytes
+    directory : None or string, optional
+        Directory of the on-disk store, disabled if None
+
+    """
+
+    def __init__(self, memory = 64*1024**2, disk = 256*1024**2, directory = None):
+        self.memory = memory
+        self.disk = disk
+        self.directory = directory
+        self.enabled = True
+        self.caches = {}
+        self.clear()
+
+    def cache(self, name, disk = False):
+        """
+
+        Returns the region ``name``, it is created on first use
+
+        Parameters
+        ----------
+        name : string
+            Region name
+        disk : boolean, optional
+            If True values are also stored on disk
+
+        Returns
+        -------
+        out : Cache
+        """
+        if (name not in self.caches):
+            self.caches[name] = Cache(self, name, disk)
+
+        return self.caches[name]
+
+    def enable(self):
+        """
+
+        Enable caching
+
+        """
+        self.enabled = True
+
+        return True
+
+    def disable(self):
+        """
+
+        Disable caching, stored values are kept but not used
+
+        """
+        self.enabled = False
+
+        return True
+
+    def clear(self, name = None, disk = False):
+        """
+
+        Remove stored values
+
+        Parameters
+        ----------
+        name : None or string, optional
+            Region to clear, all if None
+        disk : boolean, optional
+            If True the on-disk store is cleared as well
+
+        Returns
+        -------
+        out : boolean
+            True on success.
+        """
+        if (name is None):
+            self.entries = collections.OrderedDict()
+            self.used = 0
+        else:
+            for key in [key for key in self.entries if key[0] == name]:
+                self.used -= self.entries.pop(key)[1]
+
+        if (disk):
+            for filename in self._files(name):
+                os.remove(filename)
+
+        return True
+
+    def stats(self):
+        """
+
+        Returns the counters of all regions
+
+        Returns
+        -------
+        out : dict
+            Maps region names to :func:`~maabara.cache.Cache.stats`,
+            ``total`` holds the used memory and disk space
+        """
+        result = dict((name, cache.stats()) for name, cache in self.caches.items())
+        result['total'] = {'memory': self.used,
+                           'disk': sum([os.path.getsize(filename) for filename in self._files()])}
+
+        return result
+
+    def _get(self, cache, key, default):
+        if (not self.enabled):
+            return default
+
+        try:
+            entry = self.entries.pop((cache.name, key))
+        except KeyError:
+            entry = None
+
+        if (entry is None and cache.disk and self.directory is not None):
+            filename = self._filename(cache.name, key)
+            if (os.path.exists(filename)):
+                import cPickle as pickle
+                with open(filename, 'rb') as handle:
+                    value = pickle.load(handle)
+                # mark as recently used
+                os.utime(filename, None)
+                self._remember(cache, key, value)
+                cache.hits += 1
+                return value
+
+        if (entry is None):
+            cache.misses += 1
+            return default
+
+        self.entries[(cache.name, key)] = entry
+        cache.hits += 1
+
+        return entry[0]
+
+    def _set(self, cache, key, value):
+        if (not self.enabled):
+            return
+
+        self._remember(cache, key, value)
+
+        if (cache.disk and self.directory is not None):
+            import cPickle as pickle
+            filename = self._filename(cache.name, key)
+            if (not os.path.isdir(os.path.dirname(filename))):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename + '.tmp', 'wb') as handle:
+                pickle.dump(value, handle, pickle.HIGHEST_PROTOCOL)
+            os.rename(filename + '.tmp', filename)
+            self._evict_disk()
+
+    def _remember(self, cache, key, value):
+        entry = self.entries.pop((cache.name, key), None)
+        if (entry is not None):
+            self.used -= entry[1]
+
+        size = _size(value)
+        self.entries[(cache.name, key)] = (value, size)
+        self.used += size
+
+        # least recently used first
+        while (self.used > self.memory and len(self.entries) > 0):
+            (name, key), (value, size) = self.entries.popitem(last=False)
+            self.used -= size
+            self.caches[name].evictions += 1
+
+    def _filename(self, name, key):
+        return os.path.join(self.directory, name, str(key) + '.pickle')
+
+    def _files(self, name = None):
+        # files of the on-disk store
+        if (self.directory is None):
+            return []
+
+        names = [name] if name is not None else self.caches.keys()
+        result = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if (os.path.isdir(path)):
+                result.extend([os.path.join(path, filename) for filename in os.listdir(path)
+                               if filename.endswith('.pickle')])
+
+        return result
+
+    def _evict_disk(self):
+        # remove the least recently used files until the disk budget is met
+        files = [(os.path.getmtime(filename), os.path.getsize(filename), filename)
+                 for filename in self._files()]
+        used = sum([size for time, size, filename in files])
+
+        for time, size, filename in sorted(files):
+            if (used <= self.disk):
+                break
+            os.remove(filename)
+            used -= size
+            name = os.path.basename(os.path.dirname(filename))
+            if (name in self.caches):
+                self.caches[name].evictions += 1
+
+def _size(value):
+    # approximate memory footprint
+    if (isinstance(value, np.ndarray)):
+        return max(sys.getsizeof(value), value.nbytes)
+    if (isinstance(value, (tuple, list))):
+        return sys.getsizeof(value) + sum([_size(item) for item in value])
+    if (isinstance(value, dict)):
+        return sys.getsizeof(value) + sum([_size(k) + _size(v) for k, v in value.items()])
+
+    return sys.getsizeof(value)
+
+def _hash_update(digest, arg, seen = None):
+    # feed an argument into a hash, arrays by content and callables by code 
+    # and every value they depend on
+    if (seen is None):
+        seen = set()
+    
+    if (isinstance(arg, np.ndarray)):
+        arg = np.ascontiguousarray(arg)
+        digest.update(str(arg.dtype) + str(arg.shape))
+        if (arg.dtype != object):
+            digest.update(arg.view(np.uint8))
+        else:
+            _hash_update(digest, arg.tolist(), seen)
+    elif (isinstance(arg, dict)):
+        for k in sorted(arg):
+            digest.update(repr(k))
+            _hash_update(digest, arg[k], seen)
+    elif (isinstance(arg, (list, tuple))):
+        digest.update('(' + str(len(arg)))
+        for item in arg:
+            _hash_update(digest, item, seen)
+    elif (isinstance(arg, types.ModuleType)):
+        digest.update('module ' + arg.__name__)
+    elif (isinstance(arg, types.CodeType)):
+        digest.update(arg.co_code + repr(arg.co_names))
+        _hash_update(digest, arg.co_consts, seen)
+    elif (hasattr(arg, '__code__')):
+        # functions and bound methods, recursive references are hashed once
+        if (id(arg) in seen):
+            digest.update('recursion ' + arg.__name__)
+            return
+        seen.add(id(arg))
+        
+        code = arg.__code__
+        digest.update(getattr(arg, '__module__', '') + '.' + arg.__name__)
+        _hash_update(digest, code, seen)
+        _hash_update(digest, arg.__defaults__, seen)
+        _hash_update(digest, [_cell_contents(cell) for cell in (arg.__closure__ or ())], seen)
+        
+        # values of the referenced globals
+        namespace = getattr(arg, '__globals__', {})
+        _hash_update(digest, dict((name, namespace[name]) for name in _code_names(code) 
+                                  if name in namespace), seen)
+        
+        _hash_update(digest, getattr(arg, '__self__', None), seen)
+    elif (isinstance(arg, (str, unicode, int, long, float, complex, bool, type(None), np.generic))):
+        digest.update(type(arg).__name__ + repr(arg))
+    elif (hasattr(arg, '__dict__') and not isinstance(arg, type)):
+        # instances by type and attributes
+        if (id(arg) in seen):
+            digest.update('recursion ' + type(arg).__name__)
+            return
+        seen.add(id(arg))
+        digest.update(type(arg).__module__ + '.' + type(arg).__name__)
+        _hash_update(digest, vars(arg), seen)
+    else:
+        text = repr(arg)
+        if (' at 0x' in text):
+            raise ValueError('Can not derive a cache key from ' + text + ', disable caching')
+        digest.update(type(arg).__name__ + text)
+    digest.update('|')
+
+def _cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        # cell is not bound yet
+        return None
+
+def _code_names(code):
+    # global names referenced by a code object and its nested code objects
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if (isinstance(const, types.CodeType)):
+            names.update(_code_names(const))
+    
+    return sorted(names)
+
+manager = CacheManager()
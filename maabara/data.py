@@ -1,9 +1,12 @@
 from __init__ import *
 
 import numpy as np
+import sympy as sy
 import uncertainties as uc
 from scipy.optimize import curve_fit
 
+from maabara.cache import manager
+
 def literature_value(lit, value, dev = 0, mode="default"):
     """
     
@@ -11,11 +14,11 @@ def literature_value(lit, value, dev = 0, mode="default"):
     
     Parameters
     ----------
-    lit : float
+    lit : float or array_like
         Literature value
-    value : float
+    value : float or array_like
         Nominal value
-    dev : float, optional
+    dev : float or array_like, optional
         Deviation
     mode : {'default', 'ufloat', 'tex', 'tex!', 'print', or 'print:Latex name'}
         Set return mode
@@ -23,43 +26,69 @@ def literature_value(lit, value, dev = 0, mode="default"):
     Returns
     -------
     out : mixed
-        Relative deviation
+        Relative deviation. If any argument is an array all 
+        deviations are computed at once and arrays (or lists of 
+        strings for the Latex modes) are returned.
+        
+    Examples
+    --------
+    >>> ma.data.literature_value(3.141, [3.12, 3.15], [0.02, 0.01], 'tex!')
+    ['-0.7(6)', '0.29(32)']
         
     """
+    scalar = (np.ndim(lit) == 0 and np.ndim(value) == 0 and np.ndim(dev) == 0)
 
-    value = (value/float(lit) - 1)
-    deviation = (dev/float(lit))
-
-    if (deviation < 0):
-            deviation *= -1
+    lit = np.asarray(lit, dtype=float)
+    value = np.asarray(value, dtype=float)/lit - 1
+    deviation = np.abs(np.asarray(dev, dtype=float)/lit)
+    value, deviation = np.broadcast_arrays(value, deviation)
+    
+    if (scalar):
+        value = float(value)
+        deviation = float(deviation)
             
     if(mode == "ufloat"):
-        return uc.ufloat(value, deviation)
-
-    if (dev != 0):
-        percent = "{:LS}".format(uc.ufloat(value*100, deviation*100)) 
-    else:
-        percent = "{0:.1f}".format(value*100)       
+        if (scalar):
+            return uc.ufloat(value, deviation)
+        from uncertainties import unumpy
+        return unumpy.uarray(value, deviation)
+    
+    if (mode == "default"):
+        return  value, deviation
 
+    percent = _percent_strings(np.atleast_1d(value*100), np.atleast_1d(deviation*100))
 
     if(mode == "tex!"):
-        return percent
+        return percent[0] if scalar else percent
     
-    percent += " \%"
+    percent = [p + " \%" for p in percent]
     
     if(mode == "tex"):
-        return "$" + percent + "$"
+        percent = ["$" + p + "$" for p in percent]
+        return percent[0] if scalar else percent
 
     if (mode.find("print",0,5) != -1):
         tex = " Abweichung vom Literaturwert"
         if (str.find(mode,"print:") == 0):
             tex = " Abweichung vom " + mode[6:] + "-Literaturwert"
 
-        print "$" + percent + "$" + tex
+        for p in percent:
+            print "$" + p + "$" + tex
         return
         
     return  value, deviation
 
+def _percent_strings(values, deviations):
+    # format a whole column of relative deviations, identical pairs are formatted once
+    from maabara.latex import format_ufloats
+    
+    result = np.char.mod('%.1f', values).tolist()
+    index = np.flatnonzero(deviations != 0)
+    for i, tex in zip(index, format_ufloats(values[index], deviations[index], "{:LS}")):
+        result[i] = tex
+    
+    return result
+
 def weighted_average(data, mode = "default"):
     """
 
@@ -129,6 +158,8 @@ def statistic_values(x):
             (float) mean, (float) deviation, (float) deviation for a single value in set
         if x is two-dimensional:
             numpy array with two columns for mean and deviation corrosponding to input data
+        if x has more dimensions:
+            array with a last axis of mean and deviation, reduced over the last axis of x
     
     Notes
     -----
@@ -141,28 +172,66 @@ def statistic_values(x):
         \\sigma_{\\bar{x}} &= \\sqrt {\\frac1{N(N-1)} \\sum_{i=1}^N (x_i-\\overline{x})^2}
     
     """
-    x = np.array(x)
+    x = np.array(x, dtype=float)
     
-    dimensions = x.shape
-
-    if len(dimensions) == 1:
-            mean = np.mean(x)
-            n = float(len(x))
-            value_deviation = np.sqrt(1/(n-1)*np.sum((x-mean)**2))
-            set_deviation = value_deviation/(np.sqrt(n))
+    if (x.ndim == 0):
+            return False
+    
+    # reduce along the last axis, missing values (NaN) are ignored
+    n = np.sum(~np.isnan(x), axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nanmean(x, axis=-1)
+            value_deviation = np.sqrt(np.nansum((x - mean[...,np.newaxis])**2, axis=-1)/(n-1.))
+            set_deviation = value_deviation/np.sqrt(n)
 
+    if (x.ndim == 1):
             return mean, set_deviation, value_deviation
-    elif len(dimensions) == 2:
-            result = np.empty((dimensions[0],2))
-            for i in range(0,dimensions[0]):
-                    r = statistic_values(x[i,:])
-                    result[i,0] = r[0]
-                    result[i,1] = r[1]
-            return result
-    else:
-            return False
+    
+    return np.stack((mean, set_deviation), axis=-1)
 
-def student_t(x):
+_kernels = manager.cache('kernels')
+
+def student_t_factor(n, confidence = 0.682689492):
+    """
+    
+    Returns the student t-factor for a sample count
+    
+    Parameters
+    ----------
+    n : int or array_like
+        Number of values in the statistical data set
+    confidence : float, optional
+        Confidence level, by default the coverage of one standard 
+        deviation
+    
+    Returns
+    -------
+    out : float or ndarray
+        Two-sided t-quantile for ``n - 1`` degrees of freedom, NaN for ``n < 2``
+        
+    Notes
+    -----
+    Quantiles are tabulated once per confidence level and looked up 
+    afterwards, so repeated calls are cheap.
+    
+    """
+    n = np.asarray(n, dtype=int)
+    
+    table = _kernels.get(('t', confidence))
+    size = int(np.max(n, initial=0)) + 1
+    if (table is None or len(table) < size):
+        from scipy.stats import t
+        size = max(size, 64, 0 if table is None else 2*len(table))
+        with np.errstate(invalid='ignore'):
+            table = t.ppf((1 + confidence)/2., np.arange(size) - 1.)
+        _kernels.set(('t', confidence), table)
+    
+    factor = table[n]
+    if (factor.ndim == 0):
+        return float(factor)
+    return factor
+
+def student_t(x, confidence = 0.682689492):
     """
     
     Returns mean with deviation of statistical data set 
@@ -170,42 +239,58 @@ def student_t(x):
 
     See :func:`~maabara.data.statistic_values`
     
+    Parameters
+    ----------
+    x : numpy array 
+        Statistical values. The values of one data set are taken from 
+        the last axis, each set gets its own factor based on its count
+        of values that are not NaN.
+    confidence : float, optional
+        Confidence level, see :func:`~maabara.data.student_t_factor`
+    
     """
-    x = np.array(x)
+    x = np.array(x, dtype=float)
     
     stat_values = statistic_values(x)
-    n = len(x)
-    if (n <= 3):
-            tp = 1.32
-    elif (n <= 5):
-            tp = 1.15
-    elif (n <= 10):
-            tp = 1.06
-    else:
-            tp = 1.0
+    if (x.ndim == 0):
+        return False
+    
+    tp = student_t_factor(np.sum(~np.isnan(x), axis=-1), confidence)
 
-    if len(x.shape) == 1:
+    if (x.ndim == 1):
         return stat_values[0], stat_values[1]*tp
-    elif len(x.shape) == 2:
-        stat_values[:,1] *= tp
-        return stat_values
-    else:
-        return False
+    
+    stat_values[...,1] *= tp
+    return stat_values
 
 
-def linear_fit(xdata, ydata, ysigma=None, name="r"):
+def linear_fit(xdata, ydata, ysigma=None, name="r", bootstrap=0, seed=None, percentiles=(15.87, 84.13), 
+               cache=False):
     """
     Performs a linear fit to data.
 
     Parameters
     ----------
-    xdata : array like
+    xdata : array like or Dataset
     ydata : array like
+        If ``xdata`` is a :class:`~maabara.data.Dataset` the field 
+        string of independent and dependent column, e.g. ``x|y``
     ysigma : None or array like
         If provided it will be used as standard-deviation of ydata and 
         weights in the fit.
     name : string, optional
         Latex name
+    bootstrap : int, optional
+        Number of bootstrap resamples. If given the deviations of m and b 
+        are estimated from resampled data points instead of the weighted
+        sums. All resamples are solved at once.
+    seed : None or int, optional
+        Seed of the bootstrap resampling
+    percentiles : sequence, optional
+        Percentiles of the bootstrap distribution to return
+    cache : boolean, optional
+        If True results are memoized in the ``fits`` region of 
+        :data:`~maabara.cache.manager`, a repeated fit of unchanged data returns instantly.
 
     Returns
     -------
@@ -214,6 +299,12 @@ def linear_fit(xdata, ydata, ysigma=None, name="r"):
         b -- ordinate ufloat
         tex -- Latex markup of linear polynom
         
+        m and b are correlated, ``uncertainties.covariance_matrix([m, b])``
+        returns their covariance.
+        
+        If ``bootstrap`` is given a fourth array holds the 
+        percentiles of m (first row) and b (second row).
+        
     Notes
     -----
     Based on http://bulldog2.redlands.edu/facultyfolder/deweerd/tutorials/
@@ -253,51 +344,254 @@ def linear_fit(xdata, ydata, ysigma=None, name="r"):
     
     """
     
+    if isinstance(xdata, Dataset):
+        xdata, ydata, dataset_sigma = xdata.xy(ydata)
+        if ysigma is None:
+            ysigma = dataset_sigma
+    
     xdata = np.array(xdata)
     ydata = np.array(ydata)
-    ysigma = np.array(ysigma)
+    if ysigma is not None:
+        ysigma = np.array(ysigma)
+    
+    if cache:
+        key = fit_cache.key('linear_fit', xdata, ydata, ysigma, name, bootstrap, seed, percentiles)
+        hit = fit_cache.get(key)
+        if hit is not None:
+            result, chi2, dof = hit
+            _print_fit('linear_fit', chi2, dof)
+            return result
     
     if ysigma is None:
-        w = ones(len(ydata)) # Each point is equally weighted.
+        w = np.ones(len(ydata)) # Each point is equally weighted.
     else:
         w=1.0/(ysigma**2)
 
-    sw = sum(w)
-    wx = w*xdata # this product gets used to calculate swxy and swx2
-    swx = sum(wx)
-    swy = sum(w*ydata)
-    swxy = sum(wx*ydata)
-    swx2 = sum(wx*xdata)
-
-    a = (sw*swxy - swx*swy)/(sw*swx2 - swx*swx)
-    b = (swy*swx2 - swx*swxy)/(sw*swx2 - swx*swx)
-    sa = np.sqrt(sw/(sw*swx2 - swx*swx))
-    sb = np.sqrt(swx2/(sw*swx2 - swx*swx))
+    a, b, sa, sb, sab = _linear_fit(xdata, ydata, w)
+    cov = [[sa**2, sab], [sab, sb**2]]
+    
+    if bootstrap:
+        # degenerated resamples (a single distinct x) are ignored
+        with np.errstate(invalid='ignore', divide='ignore'):
+            samples = np.concatenate([np.column_stack(_linear_fit(xdata[i], ydata[i], w[i])[:2]) 
+                                      for i in _bootstrap_indices(len(ydata), bootstrap, seed)])
+        samples = samples[np.all(np.isfinite(samples), axis=1)]
+        cov = np.cov(samples.T)
+        interval = np.percentile(samples, percentiles, axis=0).T
 
     if ysigma is None:
         chi2 = sum(((a*xdata + b)-ydata)**2)
     else:
         chi2 = sum((((a*xdata + b)-ydata)/ysigma)**2)
     dof = len(ydata) - 2
-    rchi2 = chi2/dof
-    print 'results of linear_fit:'
-    print '   chi squared = ', chi2
-    print '   degrees of freedom = ', dof
-    print '   reduced chi squared = ', rchi2
+    _print_fit('linear_fit', chi2, dof)
 
-    m = uc.ufloat(a,sa)
-    b = uc.ufloat(b,sb)
+    # correlated ufloats keep the covariance of m and b
+    m, b = uc.correlated_values([a, b], cov)
     
     opr = '+'
     if (b < 0):
         opr = '-'
     tex = name + "(x) = " + "{:.1uLS}".format(m) + " \cdot x " + opr + " {:.1uLS}".format(b)
 
-    return m, b, tex
+    result = (m, b, tex)
+    if bootstrap:
+        result += (interval,)
+    
+    if cache:
+        fit_cache.set(key, (result, chi2, dof))
+
+    return result
 
+def _print_fit(name, chi2, dof):
+    rchi2 = chi2/dof
+    print 'results of ' + name + ':'
+    print '   chi squared = ', chi2
+    print '   degrees of freedom = ', dof
+    print '   reduced chi squared = ', rchi2
+
+def _linear_fit(xdata, ydata, w):
+    # weighted sums along the last axis, stacked resamples are solved at once
+    sw = np.sum(w, axis=-1)
+    wx = w*xdata # this product gets used to calculate swxy and swx2
+    swx = np.sum(wx, axis=-1)
+    swy = np.sum(w*ydata, axis=-1)
+    swxy = np.sum(wx*ydata, axis=-1)
+    swx2 = np.sum(wx*xdata, axis=-1)
+
+    a = (sw*swxy - swx*swy)/(sw*swx2 - swx*swx)
+    b = (swy*swx2 - swx*swxy)/(sw*swx2 - swx*swx)
+    sa = np.sqrt(sw/(sw*swx2 - swx*swx))
+    sb = np.sqrt(swx2/(sw*swx2 - swx*swx))
+    sab = -swx/(sw*swx2 - swx*swx)
+    
+    return a, b, sa, sb, sab
+
+def _bootstrap_indices(n, count, seed = None, size = 2**20):
+    # resampled indices in blocks of about size elements, reproducible by seed
+    random = np.random.RandomState(seed)
+    block = max(1, size // max(n, 1))
+    for start in range(0, count, block):
+        yield random.randint(0, n, size=(min(block, count - start), n))
+
+
+
+def lstsq_fit(xdata, ydata, basis = 1, sigma = None, variable = 'x'):
+    """
+    
+    Weighted linear least squares fit of polynomials or arbitrary 
+    basis functions
+    
+    Assumes ``ydata = sum(params[i]*basis[i](xdata)) + eps``
+    
+    Parameters
+    ----------
+    xdata : N-length sequence or Dataset
+        The independent variable
+    ydata : N-length sequence or KxN array
+        The dependent data. A KxN array holds K datasets that are 
+        solved at once. If ``xdata`` is a :class:`~maabara.data.Dataset` 
+        the field string of independent and dependent column, e.g. ``x|y``
+    basis : int or list, optional
+        Degree of a polynomial ``p0 + p1*x + p2*x**2 + ...`` or a list 
+        of basis functions given as callables ``f(x)`` or sympy 
+        equation strings, e.g. ``['1', 'sin(x)', 'cos(x)']``
+    sigma : None, N-length sequence or KxN array
+        Standard-deviation of ydata used as weights. If None the 
+        deviation is estimated from the residuals.
+    variable : string, optional
+        Name of the independent variable in equation strings
+        
+    Returns
+    -------
+    out : params, cov
+        params -- array of correlated ufloats
+        cov -- MxM covariance matrix
+        
+        For K datasets a KxM array of nominal values and a KxMxM array 
+        of covariance matrices.
+        
+    Examples
+    --------
+    >>> x = [0.0, 2.0, 4.0, 6.0, 8.0]
+    >>> y = [1.1, 1.9, 3.2, 4.0, 5.9]
+    >>> y_err = [0.1, 0.2, 0.1, 0.3, 0.3]
+    >>> (c, b, a), cov = ma.data.lstsq_fit(x, y, 2, y_err)
+    
+    """
+    if isinstance(xdata, Dataset):
+        xdata, ydata, dataset_sigma = xdata.xy(ydata)
+        if sigma is None:
+            sigma = dataset_sigma
+    
+    xdata = np.array(xdata, dtype=float)
+    ydata = np.array(ydata, dtype=float)
+    single = (ydata.ndim == 1)
+    ydata = np.atleast_2d(ydata)
+    
+    # design matrix
+    if (isinstance(basis, (int, long))):
+        design = np.vander(xdata, basis + 1, increasing=True)
+    else:
+        columns = []
+        for function in basis:
+            if (isinstance(function, str)):
+                function = model_function(function, variable, [])[0]
+            columns.append(function(xdata) + np.zeros(xdata.shape))
+        design = np.column_stack(columns)
+    
+    count, m = ydata.shape[0], design.shape[1]
+    dof = ydata.shape[1] - m
+    
+    if (sigma is None or np.ndim(sigma) == 1):
+        # shared weights, one QR decomposition for all datasets
+        w = np.ones(len(xdata)) if sigma is None else 1/np.asarray(sigma, dtype=float)
+        q, r = np.linalg.qr(design*w[:,np.newaxis])
+        params = np.linalg.solve(r, np.dot(q.T, (ydata*w).T)).T
+        rinv = np.linalg.inv(r)
+        cov = np.repeat(np.dot(rinv, rinv.T)[np.newaxis], count, axis=0)
+        chi2 = np.sum(((np.dot(params, design.T) - ydata)*w)**2, axis=1)
+    else:
+        # individual weights, stacked normal equations
+        w = 1/np.asarray(sigma, dtype=float)**2
+        cov = np.linalg.inv(np.einsum('nm,kn,nl->kml', design, w, design))
+        params = np.einsum('kml,kl->km', cov, np.dot(w*ydata, design))
+        chi2 = np.sum((np.dot(params, design.T) - ydata)**2*w, axis=1)
+    
+    if (sigma is None):
+        cov *= (chi2/dof)[:,np.newaxis,np.newaxis]
+    
+    if (not single):
+        return params, cov
+    
+    _print_fit('lstsq_fit', chi2[0], dof)
+    
+    return np.array(uc.correlated_values(params[0], cov[0])), cov[0]
 
+def model_function(equation, variable = 'x', parameters = None):
+    """
+    
+    Compiles a model equation string and its analytic Jacobian into 
+    vectorized functions
+    
+    Parameters
+    ----------
+    equation : sympy equation string
+        Model in the syntax of :func:`~maabara.uncertainty.Sheet.set_equation`, 
+        e.g. ``a*exp(-b*x) + c``
+    variable : string, optional
+        Name of the independent variable
+    parameters : None or list of strings, optional
+        Parameter order. If None, all remaining symbols of the equation 
+        are used in alphabetical order.
 
-def general_fit(f, xdata, ydata, p0=None, sigma=None, **kw):
+    Returns
+    -------
+    out : f, jac, parameters
+        f -- model function ``f(x, *params)``
+        jac -- Jacobian ``jac(x, *params)`` returning a NxM array
+        parameters -- list of parameter names
+        
+    Examples
+    --------
+    >>> f, jac, params = ma.data.model_function('a*exp(-b*x) + c')
+    >>> params
+    ['a', 'b', 'c']
+    
+    """
+    key = ('model', equation, variable, None if parameters is None else tuple(parameters))
+    compiled = _kernels.get(key)
+    if (compiled is not None):
+        return compiled[0], compiled[1], list(compiled[2])
+    
+    equation = equation.replace('_','')
+    variable = variable.replace('_','')
+    expr = sy.sympify(equation)
+    
+    if parameters is None:
+        parameters = sorted(str(e) for e in expr.free_symbols if str(e) != variable)
+    else:
+        parameters = [str(e).replace('_','') for e in parameters]
+    
+    symbols = [sy.Symbol(variable)] + [sy.Symbol(e) for e in parameters]
+    
+    model = sy.lambdify(symbols, expr, modules='numpy')
+    derivatives = [sy.lambdify(symbols, sy.diff(expr, e), modules='numpy') for e in symbols[1:]]
+    
+    def f(x, *params):
+        # constant terms have to be expanded to the shape of x
+        return model(x, *params) + np.zeros(np.shape(x))
+    
+    def jac(x, *params):
+        ones = np.ones(np.shape(x))
+        return np.column_stack([d(x, *params)*ones for d in derivatives])
+    
+    _kernels.set(key, (f, jac, tuple(parameters)))
+    
+    return f, jac, parameters
+    
+def general_fit(f, xdata, ydata, p0=None, sigma=None, variable='x', bootstrap=0, seed=None, 
+                percentiles=(15.87, 84.13), workers=1, cache=False, mode='default', **kw):
     """
     
     Use non-linear least squares to fit a function, f, to data.
@@ -307,15 +601,21 @@ def general_fit(f, xdata, ydata, p0=None, sigma=None, **kw):
 
     Parameters
     ----------
-    f : callable
+    f : callable or sympy equation string
         The model function, f(x, ...).  It must take the independent
         variable as the first argument and the parameters to fit as
         separate remaining arguments.
+        
+        If a string is given it is compiled by 
+        :func:`~maabara.data.model_function` and its analytic Jacobian
+        is passed to the optimizer. Parameters are ordered alphabetically.
     xdata : An N-length sequence or an (k,N)-shaped array
-        for functions with k predictors.
+        for functions with k predictors or a Dataset.
         The independent variable where the data is measured.
     ydata : N-length sequence
         The dependent data --- nominally f(xdata, ...)
+        If ``xdata`` is a :class:`~maabara.data.Dataset` the field 
+        string of independent and dependent column, e.g. ``x|y``
     p0 : None, scalar, or M-length sequence
         Initial guess for the parameters.  If None, then the initial
         values will all be 1 (if the number of parameters for the function
@@ -325,11 +625,35 @@ def general_fit(f, xdata, ydata, p0=None, sigma=None, **kw):
         If not None, it represents the standard-deviation of ydata.
         This vector, if given, will be used as weights in the
         least-squares problem.
+    variable : string, optional
+        Name of the independent variable if ``f`` is an equation string
+    bootstrap : int, optional
+        Number of bootstrap resamples. If given the deviations are 
+        estimated from fits to resampled data points.
+    seed : None or int, optional
+        Seed of the bootstrap resampling. Results do not depend on ``workers``.
+    percentiles : sequence, optional
+        Percentiles of the bootstrap distribution to return
+    workers : int or None, optional
+        Number of processes the bootstrap fits are spread over, 
+        see :func:`~maabara.data.batch_fit`
+    cache : boolean, optional
+        If True results are memoized in the ``fits`` region of 
+        :data:`~maabara.cache.manager`. A callable model is identified by its 
+        name, code, defaults, closure cells, referenced globals and bound instance. 
+        Raises ValueError if one of them has no stable representation to derive 
+        a key from, e.g. an object printed with its memory address.
+    mode : {'default', 'ufloat', or 'cov'}, optional
+        Set return mode
 
     Returns
     -------
-    out : Nx2 array 
-        Parameter value and its deviation
+    out : mixed
+        'default' will return Nx2 array of parameter value and its 
+        deviation. If ``bootstrap`` is given additional columns hold 
+        the percentiles.
+        'ufloat' will return an array of correlated ufloats.
+        'cov' will return the default array and the covariance matrix.
 
     Notes
     -----
@@ -350,10 +674,160 @@ def general_fit(f, xdata, ydata, p0=None, sigma=None, **kw):
     >>> yn = y + 0.2*np.random.normal(size=len(x))
 
     >>> r = general_fit(func, x, yn)
+    
+    Same fit using an equation string
+    
+    >>> r = general_fit('a*exp(-b*x) + c', x, yn)
+    """
+    if isinstance(xdata, Dataset):
+        xdata, ydata, dataset_sigma = xdata.xy(ydata)
+        if sigma is None:
+            sigma = dataset_sigma
+    
+    if cache:
+        key = fit_cache.key('general_fit', f, xdata, ydata, p0, sigma, variable, 
+                            bootstrap, seed, percentiles, kw)
+        hit = fit_cache.get(key)
+        if hit is not None:
+            result, pcov, chi2, dof = hit
+            _print_fit('general_fit', chi2, dof)
+            return _fit_result(result.copy(), pcov.copy(), mode)
+    
+    popt, pcov, chi2, dof = _general_fit(f, xdata, ydata, p0, sigma, variable, **kw)
+
+    _print_fit('general_fit', chi2, dof)
+
+    # The uncertainties are the square roots of the diagonal elements
+    punc = np.zeros(len(popt))
+    for i in np.arange(0,len(popt)):
+        punc[i] = np.sqrt(pcov[i,i])
+    
+    if bootstrap:
+        tasks = [(f, xdata, ydata, popt, sigma, variable, kw, indices) 
+                 for indices in _bootstrap_indices(len(ydata), bootstrap, seed, 2**16)]
+        samples = np.concatenate(_map(_bootstrap_block, tasks, workers))
+        samples = samples[np.all(np.isfinite(samples), axis=1)]
+        pcov = np.atleast_2d(np.cov(samples.T))
+        punc = np.sqrt(np.diag(pcov))
+        interval = np.percentile(samples, percentiles, axis=0).T
+        
+        result = np.column_stack((popt, punc, interval))
+    else:
+        result = np.column_stack((popt, punc))
+    
+    if cache:
+        fit_cache.set(key, (result.copy(), pcov.copy(), chi2, dof))
+
+    return _fit_result(result, pcov, mode)
+
+def _fit_result(result, pcov, mode):
+    if (mode == 'ufloat'):
+        return np.array(uc.correlated_values(result[:,0], pcov))
+    elif (mode == 'cov'):
+        return result, pcov
+    
+    return result
+
+def fit_band(f, xdata, params, cov = None, level = 1, variable = 'x', parameters = None):
     """
+    
+    Evaluates a fitted model and its uncertainty band
+    
+    Parameters
+    ----------
+    f : callable or sympy equation string
+        The model function f(x, ...), see :func:`~maabara.data.general_fit`.
+        The Jacobian of equation strings is computed analytically, 
+        otherwise by finite differences.
+    xdata : array_like
+        Points to evaluate, e.g. ``np.linspace(0, 4, 1000)``
+    params : sequence of ufloats or array_like
+        Fitted parameters in the order of the model arguments. Correlated 
+        ufloats as returned by :func:`~maabara.data.linear_fit` carry their 
+        covariance. A Nx2 result array of :func:`~maabara.data.general_fit` 
+        uses its first column.
+    cov : None or MxM array, optional
+        Covariance matrix of the parameters. If None it is taken from 
+        the ufloats or the deviation column of a result array.
+    level : float, optional
+        Width of the band in standard deviations
+    variable : string, optional
+        Name of the independent variable if ``f`` is an equation string
+    parameters : None or list of strings, optional
+        Parameter order of an equation string, see :func:`~maabara.data.model_function`
+        
+    Returns
+    -------
+    out : y, dy
+        Model values and the half width of the band
+        
+    Examples
+    --------
+    >>> m, b, tex = ma.data.linear_fit(x, y, y_err)
+    >>> xs = np.linspace(min(x), max(x), 1000)
+    >>> y, dy = ma.data.fit_band(lambda x, m, b: m*x + b, xs, [m, b], level=2)
+    >>> fill_between(xs, y - dy, y + dy, alpha=0.3)
+    
+    """
+    xdata = np.asarray(xdata, dtype=float)
+    
+    if (len(params) > 0 and isinstance(params[0], uc.UFloat)):
+        if cov is None:
+            cov = uc.covariance_matrix(params)
+        params = [p.n for p in params]
+    else:
+        params = np.asarray(params, dtype=float)
+        if (params.ndim == 2):
+            if cov is None:
+                cov = np.diag(params[:,1]**2)
+            params = params[:,0]
+    cov = np.asarray(cov, dtype=float)
+    
+    if (isinstance(f, str)):
+        f, jac, parameters = model_function(f, variable, parameters)
+        j = jac(xdata, *params)
+    else:
+        # forward differences, one vectorized evaluation per parameter
+        y = f(xdata, *params)
+        j = np.empty((len(xdata), len(params)))
+        for i in range(len(params)):
+            step = np.sqrt(np.finfo(float).eps)*max(abs(params[i]), 1.)
+            shifted = np.array(params, dtype=float)
+            shifted[i] += step
+            j[:,i] = (f(xdata, *shifted) - y)/step
+    
+    y = f(xdata, *params)
+    dy = level*np.sqrt(np.einsum('ni,ij,nj->n', j, cov, j))
+    
+    return y, dy
+
+def _bootstrap_block(task):
+    f, xdata, ydata, p0, sigma, variable, kw, indices = task
+    
     xdata = np.array(xdata)
     ydata = np.array(ydata)
-    sigma = np.array(sigma)
+    if sigma is not None:
+        sigma = np.array(sigma)
+    f, p0, kw = _compile(f, p0, variable, kw)
+    
+    result = np.empty((len(indices), len(p0)))
+    for i, index in enumerate(indices):
+        try:
+            result[i] = curve_fit(f, xdata[...,index], ydata[index], p0, 
+                                  None if sigma is None else sigma[index], **kw)[0]
+        except (RuntimeError, ValueError):
+            result[i] = np.nan
+    
+    return result
+
+def _general_fit(f, xdata, ydata, p0=None, sigma=None, variable='x', **kw):
+    # silent fit kernel shared by general_fit and batch_fit
+    xdata = np.array(xdata)
+    ydata = np.array(ydata)
+    if sigma is not None:
+        sigma = np.array(sigma)
+    
+    f, p0, kw = _compile(f, p0, variable, kw)
     
     popt, pcov = curve_fit(f, xdata, ydata, p0, sigma, **kw)
 
@@ -362,21 +836,759 @@ def general_fit(f, xdata, ydata, p0=None, sigma=None, **kw):
     else:
         chi2 = sum(((f(xdata,*popt)-ydata)/sigma)**2)
     dof = len(ydata) - len(popt)
-    rchi2 = chi2/dof
-    print 'results of general_fit:'
-    print '   chi squared = ', chi2
-    print '   degrees of freedom = ', dof
-    print '   reduced chi squared = ', rchi2
+    
+    return popt, pcov, chi2, dof
 
-    # The uncertainties are the square roots of the diagonal elements
-    punc = np.zeros(len(popt))
-    for i in np.arange(0,len(popt)):
-        punc[i] = np.sqrt(pcov[i,i])
+def _compile(f, p0, variable, kw):
+    # compile equation string models, their Jacobian is passed to curve_fit
+    if isinstance(f, str):
+        f, jac, parameters = model_function(f, variable)
+        kw = dict({'jac': jac}, **kw)
+        if p0 is None:
+            p0 = np.ones(len(parameters))
+    
+    return f, p0, kw
 
-    result = np.column_stack((popt, punc))
+def _map(func, tasks, workers = 1):
+    # map tasks in order, using a process pool if more than one worker is requested
+    if workers == 1:
+        return map(func, tasks)
+    
+    import multiprocessing
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
 
+def _batch_fit_block(task):
+    f, xs, ys, p0, sigmas, warm_start, variable, kw = task
+    
+    # compile once per block
+    f, p0, kw = _compile(f, p0, variable, kw)
+    
+    result = []
+    for xdata, ydata, sigma in zip(xs, ys, sigmas):
+        try:
+            popt, pcov, chi2, dof = _general_fit(f, xdata, ydata, p0, sigma, variable, **kw)
+        except (RuntimeError, ValueError):
+            result.append(None)
+            continue
+        
+        if warm_start:
+            p0 = popt
+        result.append((popt, np.sqrt(np.diag(pcov)), chi2, dof))
+    
     return result
 
+def batch_fit(f, xdata, ydata, p0=None, sigma=None, workers=1, warm_start=False, variable='x', **kw):
+    """
+    
+    Fits a model to many independent datasets, see :func:`~maabara.data.general_fit`
+    
+    Parameters
+    ----------
+    f : callable or sympy equation string
+        The model function, see :func:`~maabara.data.general_fit`. 
+        A callable must be defined on module level if ``workers`` is 
+        not 1 since it has to be sent to the worker processes.
+    xdata : N-length sequence or sequence of K sequences
+        Independent variable shared by all datasets or one per dataset
+    ydata : KxN array or sequence of K sequences
+        The datasets to fit
+    p0 : None, scalar, or M-length sequence
+        Initial guess for the parameters of every dataset
+    sigma : None, N-length sequence or sequence of K sequences
+        Standard-deviation of ydata, shared or one per dataset
+    workers : int or None, optional
+        Number of worker processes. ``None`` uses all available CPUs.
+    warm_start : boolean, optional
+        If True each fit starts from the solution of the preceding 
+        dataset in the same block of work
+    variable : string, optional
+        Name of the independent variable if ``f`` is an equation string
+
+    Returns
+    -------
+    out : structured array of length K
+        Fields ``p`` (parameters), ``sigma`` (deviations), ``chi2``, 
+        ``dof`` and ``success``. Failed fits hold NaN parameters.
+        
+    Notes
+    -----
+    Additional keyword arguments are passed to ``curve_fit``.
+    
+    Examples
+    --------
+    >>> x = np.linspace(0,4,50)
+    >>> spectra = [2.5*np.exp(-1.3*x) + 0.5 + 0.02*np.random.normal(size=len(x)) for i in range(1000)]
+    >>> r = ma.data.batch_fit('a*exp(-b*x) + c', x, spectra, workers=4, warm_start=True)
+    >>> r['p'][:,1].mean()
+    1.3000...
+    
+    """
+    ydata = list(ydata)
+    count = len(ydata)
+    
+    def expand(values):
+        # share a single sequence among all datasets
+        if values is None or np.ndim(values[0]) == 0:
+            return [values] * count
+        return list(values)
+    
+    xs = expand(xdata)
+    sigmas = expand(sigma)
+    
+    if p0 is not None:
+        p0 = np.atleast_1d(p0)
+        m = len(p0)
+    elif isinstance(f, str):
+        m = len(model_function(f, variable)[2])
+    else:
+        import inspect
+        m = len(inspect.getargspec(f)[0]) - 1
+    
+    # contiguous blocks keep neighbours together for warm starting
+    if workers == 1:
+        size = max(count, 1)
+    else:
+        import multiprocessing
+        size = int(np.ceil(count / (4. * (workers or multiprocessing.cpu_count())))) or 1
+    
+    tasks = [(f, xs[i:i+size], ydata[i:i+size], p0, sigmas[i:i+size], warm_start, variable, kw)
+             for i in range(0, count, size)]
+    
+    fits = [fit for block in _map(_batch_fit_block, tasks, workers) for fit in block]
+    
+    result = np.zeros(count, dtype=[('p', float, (m,)), ('sigma', float, (m,)), 
+                                    ('chi2', float), ('dof', int), ('success', bool)])
+    for i, fit in enumerate(fits):
+        if fit is None:
+            result[i]['p'] = np.nan
+            result[i]['sigma'] = np.nan
+            result[i]['chi2'] = np.nan
+            result[i]['dof'] = len(ydata[i]) - m
+        else:
+            result[i] = fit + (True,)
+    
+    return result
+
+fit_cache = manager.cache('fits', disk = True)
+
+class Binning(object):
+    """
+    
+    Streaming binned statistics
+    
+    Accumulates per-bin mean, standard error and counts over data chunks 
+    with constant memory, see :func:`~maabara.data.bin_data`
+    
+    Parameters
+    ----------
+    edges : array_like
+        Monotonically increasing bin edges. Values outside are ignored, 
+        the last bin includes its right edge.
+        
+    Examples
+    --------
+    >>> binning = ma.data.Binning(np.linspace(0, 10, 101))
+    >>> for x, y in chunks:
+    ...     binning.add(x, y)
+    >>> x, y, sigma, counts = binning.result()
+    >>> ma.data.linear_fit(x, y, sigma)
+    
+    """
+    
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.reset()
+    
+    def reset(self):
+        """
+        
+        Clear accumulated data
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+        """
+        bins = len(self.edges) - 1
+        
+        self.counts = np.zeros(bins, dtype=int)
+        self.mean = np.zeros(bins)
+        self.m2 = np.zeros(bins)
+        
+        # weighted sums
+        self.sw = np.zeros(bins)
+        self.swy = np.zeros(bins)
+        
+        return True
+    
+    def add(self, x, y, sigma = None):
+        """
+        
+        Add a chunk of data
+        
+        Parameters
+        ----------
+        x : array_like
+            Values which are binned
+        y : array_like
+            Values which are averaged
+        sigma : None or array_like, optional
+            Deviations of y. If given the weighted mean is accumulated 
+            as well.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        bins = len(self.counts)
+        
+        index = np.searchsorted(self.edges, x, side='right') - 1
+        index[x == self.edges[-1]] = bins - 1
+        valid = (index >= 0) & (index < bins) & np.isfinite(y)
+        if (sigma is not None):
+            sigma = np.broadcast_to(np.asarray(sigma, dtype=float), y.shape)
+            valid &= np.isfinite(sigma) & (sigma > 0)
+            sigma = sigma[valid]
+        index = index[valid]
+        y = y[valid]
+        
+        # chunk statistics
+        counts = np.bincount(index, minlength=bins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(index, y, minlength=bins)/counts
+        mean[counts == 0] = 0
+        m2 = np.bincount(index, (y - mean[index])**2, minlength=bins)
+        
+        # merge with previous chunks (Chan et al.)
+        total = self.counts + counts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            self.mean += np.where(total > 0, delta*counts/total, 0)
+            self.m2 += m2 + np.where(total > 0, delta**2*self.counts*counts/total, 0)
+        self.counts = total
+        
+        if (sigma is not None):
+            w = 1/sigma**2
+            self.sw += np.bincount(index, w, minlength=bins)
+            self.swy += np.bincount(index, w*y, minlength=bins)
+    
+    def result(self, weighted = False, empty = False):
+        """
+        
+        Returns binned statistics
+        
+        Parameters
+        ----------
+        weighted : boolean, optional
+            If True the weighted mean and its deviation are returned,
+            see :func:`~maabara.data.weighted_average`
+        empty : boolean, optional
+            If True empty bins are kept as NaN
+        
+        Returns
+        -------
+        out : centers, mean, sem, counts
+            centers -- bin centers
+            mean -- mean of each bin
+            sem -- standard error of the mean (NaN for single values)
+            counts -- number of values in each bin
+        """
+        centers = (self.edges[:-1] + self.edges[1:])/2.
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if (weighted):
+                mean = self.swy/self.sw
+                sem = np.sqrt(1/self.sw)
+                filled = self.sw > 0
+            else:
+                mean = np.where(self.counts > 0, self.mean, np.nan)
+                sem = np.sqrt(self.m2/(self.counts - 1.)/self.counts)
+                sem[self.counts < 2] = np.nan
+                filled = self.counts > 0
+        
+        if (empty):
+            mean[~filled] = np.nan
+            sem[~filled] = np.nan
+            return centers, mean, sem, self.counts.copy()
+        
+        return centers[filled], mean[filled], sem[filled], self.counts[filled]
+
+def bin_data(x, y = None, bins = 10, sigma = None, range = None, empty = False):
+    """
+    
+    Reduces data to binned means with uncertainties
+    
+    Parameters
+    ----------
+    x : array_like or iterable of tuples
+        Values which are binned. An iterable of ``(x, y)`` or 
+        ``(x, y, sigma)`` chunks is processed chunk by chunk with 
+        constant memory.
+    y : array_like
+        Values which are averaged, not used for chunks
+    bins : int or array_like, optional
+        Number of equal-width bins or bin edges
+    sigma : None or array_like, optional
+        Deviations of y. If given the weighted mean and its deviation
+        are returned.
+    range : (float, float), optional
+        Range of equal-width bins. By default the range of x, chunked 
+        input requires it.
+    empty : boolean, optional
+        If True empty bins are kept as NaN
+        
+    Returns
+    -------
+    out : centers, mean, sem, counts
+        See :func:`~maabara.data.Binning.result`. The arrays can be passed 
+        directly as xdata, ydata and sigma to the fit functions.
+        
+    Examples
+    --------
+    >>> x, y, sigma, counts = ma.data.bin_data(t, trace, bins=1000)
+    >>> r = ma.data.general_fit('a*exp(-b*x) + c', x, y, sigma=sigma)
+    
+    Chunks from a generator
+    
+    >>> chunks = ((t[i:i+10**6], trace[i:i+10**6]) for i in range(0, len(t), 10**6))
+    >>> x, y, sigma, counts = ma.data.bin_data(chunks, bins=1000, range=(0, 1))
+    
+    """
+    chunked = (y is None)
+    
+    if (np.ndim(bins) == 0):
+        if (range is None):
+            if (chunked):
+                raise ValueError("Chunked input requires a range or bin edges")
+            x = np.asarray(x, dtype=float)
+            range = (np.nanmin(x), np.nanmax(x))
+        bins = np.linspace(range[0], range[1], bins + 1)
+    
+    binning = Binning(bins)
+    
+    if (chunked):
+        weighted = False
+        for chunk in x:
+            binning.add(*chunk)
+            weighted = len(chunk) > 2
+    else:
+        binning.add(x, y, sigma)
+        weighted = sigma is not None
+    
+    return binning.result(weighted, empty)
+
+class Dataset(object):
+    """
+    
+    Columnar container of measured values and their deviations
+    
+    Parameters
+    ----------
+    data : array_like NxM, tuple of array_like or dict, optional
+        See :func:`~maabara.data.Dataset.set_data`
+    fields : string, optional
+        See :func:`~maabara.data.Dataset.set_data`
+        
+    Examples
+    --------
+    >>> ds = ma.data.Dataset([ [0.5, 1. , 0.1],  [0.3, 2. ,0.15] ], 'a|x|x%')
+    >>> ds['x'], ds['x%']
+    (array([ 1.,  2.]), array([ 0.1 ,  0.15]))
+    
+    A dataset can be passed to :func:`~maabara.uncertainty.Sheet.batch`,
+    the fit functions and :func:`~maabara.latex.Table.add_column`
+    
+    >>> stack = ma.uncertainty.Sheet('a*x**3')
+    >>> stack.set_value('a', error=0.05)
+    >>> stack.batch(ds)
+    array([[ 0.5       ,  0.15811388],
+           [ 2.4       ,  0.6720119 ]])
+    
+    """
+    
+    def __init__(self, data = None, fields = None):
+        self.reset()
+        if (data is not None):
+            self.set_data(data, fields)
+    
+    def reset(self):
+        """
+        
+        Clear all columns
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+        """
+        self.values = {}
+        self.sigmas = {}
+        self.names = []
+        
+        return True
+        
+    def set_data(self, data, fields = None):
+        """
+        
+        Set columns from an array
+        
+        Parameters
+        ----------
+        data : array_like NxM, tuple of array_like or dict
+            A tuple will be stacked to columns. Columns of an array 
+            are stored as views without copying. A dict maps field 
+            names to columns.
+        fields : string
+            List of columns fields divided by ``|``, see 
+            :func:`~maabara.uncertainty.Sheet.batch`. Deviations 
+            columns must be suffix by ``%``. Use ``*`` to ignore a column.
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+        """
+        if (isinstance(data, dict)):
+            items = sorted(data.items(), key=lambda item: item[0].endswith('%'))
+        else:
+            if (isinstance(data, tuple)):
+                data = np.column_stack(data)
+            data = np.asarray(data)
+            if (data.ndim == 1):
+                data = data[:,np.newaxis]
+                
+            fields = str.split(fields.strip(),"|")
+            if (len(fields) != data.shape[1]):
+                raise ValueError("Number of fields does not match number of columns")
+            
+            # deviations last, their value columns have to exist
+            items = [(field, data[:,i]) for i, field in enumerate(fields) if field != '*']
+            items.sort(key=lambda item: item[0].endswith('%'))
+        
+        for field, column in items:
+            if (field.endswith('%')):
+                self.set_sigma(field[:-1], column)
+            else:
+                self.add_column(field, column)
+        
+        return True
+    
+    def add_column(self, name, values, sigma = None):
+        """
+        
+        Add or replace a value column
+        
+        Parameters
+        ----------
+        name : string
+            Field name, e.g. a variable name of a Sheet equation
+        values : array_like
+            Values, arrays are stored without copying
+        sigma : None, float or array_like, optional
+            Deviations of the values
+        """
+        values = np.asarray(values)
+        if (len(self.names) > 0 and len(values) != len(self)):
+            raise ValueError("Column length does not match dataset length")
+            
+        if (name not in self.values):
+            self.names.append(name)
+        self.values[name] = values
+        
+        if (sigma is not None):
+            self.set_sigma(name, sigma)
+    
+    def set_sigma(self, name, sigma):
+        """
+        
+        Set deviations of a value column
+        
+        Parameters
+        ----------
+        name : string
+            Field name of an existing value column
+        sigma : float or array_like
+            Deviations, a constant will be expanded to the column length
+        """
+        if (name not in self.values):
+            raise ValueError("Unknown field: " + name)
+        
+        sigma = np.asarray(sigma)
+        if (sigma.ndim == 0):
+            sigma = np.broadcast_to(sigma, self.values[name].shape)
+        self.sigmas[name] = sigma
+    
+    def __len__(self):
+        if (len(self.names) == 0):
+            return 0
+        return len(self.values[self.names[0]])
+    
+    def __contains__(self, field):
+        if (field.endswith('%')):
+            return field[:-1] in self.sigmas
+        return field in self.values
+    
+    def __getitem__(self, key):
+        # string keys return column views, everything else selects rows
+        if (isinstance(key, str)):
+            if (key.endswith('%')):
+                return self.sigmas[key[:-1]]
+            return self.values[key]
+        
+        result = Dataset()
+        for name in self.names:
+            result.add_column(name, self.values[name][key], 
+                              self.sigmas[name][key] if name in self.sigmas else None)
+        return result
+    
+    def fields(self, names = None):
+        """
+        
+        Returns the field string of the dataset as used by 
+        :func:`~maabara.uncertainty.Sheet.batch`
+        
+        Parameters
+        ----------
+        names : None, string or list, optional
+            Value columns to include (divided by ``|`` if string), 
+            by default all
+        
+        Returns
+        -------
+        out : string
+            e.g. ``a|x|x%``
+        """
+        if (names is None):
+            names = self.names
+        elif (isinstance(names, str)):
+            names = str.split(names.strip(),"|")
+            
+        fields = []
+        for name in names:
+            if (name.endswith('%')):
+                continue
+            fields.append(name)
+            if (name in self.sigmas):
+                fields.append(name + '%')
+        
+        return '|'.join(fields)
+    
+    def array(self, fields = None):
+        """
+        
+        Returns the columns stacked to an array
+        
+        Parameters
+        ----------
+        fields : None or string, optional
+            Field string, see :func:`~maabara.data.Dataset.fields`
+            
+        Returns
+        -------
+        out : NxM array
+        """
+        if (fields is None):
+            fields = self.fields()
+        
+        return np.column_stack([self[field] for field in str.split(fields,"|")])
+    
+    def valid(self, fields = None):
+        """
+        
+        Returns a validity mask of the rows
+        
+        Parameters
+        ----------
+        fields : None or string, optional
+            Fields divided by ``|`` to check, by default all columns 
+            including deviations
+            
+        Returns
+        -------
+        out : boolean array
+            True where all checked values are finite numbers
+        """
+        if (fields is None):
+            fields = self.fields()
+        
+        mask = np.ones(len(self), dtype=bool)
+        for field in str.split(fields,"|"):
+            mask &= np.isfinite(self[field])
+        
+        return mask
+    
+    def end(self, name):
+        """
+        
+        Returns the index behind the last non-zero value of a column, 
+        i.e. the length of a zero padded column
+        
+        Parameters
+        ----------
+        name : string
+            Field name
+        
+        Returns
+        -------
+        out : int
+        """
+        end = _end(self[name])
+        if (end is None):
+            return 0
+        return end
+        
+    def xy(self, fields):
+        """
+        
+        Returns fit data of two columns, see :func:`~maabara.data.linear_fit`
+        
+        Parameters
+        ----------
+        fields : string
+            Independent and dependent field divided by ``|``, e.g. ``x|y``.
+            Deviations of the dependent field are used as sigma.
+        
+        Returns
+        -------
+        out : xdata, ydata, sigma
+            Valid rows only. sigma is None if the dependent field has no deviations.
+        """
+        x, y = str.split(fields.strip(),"|")
+        mask = self.valid(self.fields([x, y]))
+        
+        sigma = None
+        if (y in self.sigmas):
+            sigma = self.sigmas[y][mask]
+        
+        return self.values[x][mask], self.values[y][mask], sigma
+
+def load(filename, fields = None, chunksize = None, delimiter = None, comments = '#'):
+    """
+    
+    Loads measurement data from file into a :class:`~maabara.data.Dataset`
+    
+    Parameters
+    ----------
+    filename : string or file
+        Delimited text file, ``.npy`` or ``.npz`` file. For text 
+        files a first line of names is used as header, e.g. ``a x x%``. 
+        Keys of ``.npz`` files are used as field names.
+    fields : string, optional
+        Column fields divided by ``|``, see :func:`~maabara.uncertainty.Sheet.batch`.
+        Overrides the header, required for ``.npy`` files.
+    chunksize : None or int, optional
+        If given a generator of datasets of at most ``chunksize`` rows 
+        is returned
+    delimiter : None or string, optional
+        Column delimiter of text files, by default any whitespace
+    comments : string, optional
+        Lines starting with this character are skipped
+        
+    Returns
+    -------
+    out : Dataset or generator of Datasets
+    
+    Examples
+    --------
+    Stream a file of ``a x x%`` columns into batch propagation
+    
+    >>> stack = ma.uncertainty.Sheet('a*x**3')
+    >>> result = np.concatenate([stack.batch(chunk) 
+    ...                          for chunk in ma.data.load('data.txt', chunksize=10000)])
+    
+    """
+    chunks = _load_chunks(filename, fields, chunksize, delimiter, comments)
+    
+    if (chunksize is not None):
+        return chunks
+    
+    # the file is closed at once, an empty file without header is an empty dataset
+    try:
+        for dataset in chunks:
+            return dataset
+        return Dataset()
+    finally:
+        chunks.close()
+
+def _load_chunks(filename, fields, chunksize, delimiter, comments):
+    name = getattr(filename, 'name', filename)
+    
+    if (isinstance(name, str) and name.endswith('.npz')):
+        archive = np.load(filename)
+        names = str.split(fields,"|") if fields is not None else archive.files
+        columns = dict((field, archive[field]) for field in names if field != '*')
+        length = len(columns.values()[0])
+        for start in range(0, length, chunksize or max(length, 1)):
+            yield Dataset(dict((field, column[start:start+chunksize] if chunksize else column) 
+                               for field, column in columns.items()))
+        return
+    
+    if (isinstance(name, str) and name.endswith('.npy')):
+        if (fields is None):
+            raise ValueError("Loading .npy files requires fields")
+        data = np.load(filename, mmap_mode='r')
+        for start in range(0, len(data), chunksize or max(len(data), 1)):
+            yield Dataset(data[start:start+chunksize] if chunksize else data, fields)
+        return
+    
+    import itertools
+    
+    handle = open(filename) if isinstance(filename, str) else filename
+    try:
+        lines = (line for line in handle if line.strip() != '' and not line.lstrip().startswith(comments))
+        
+        # header line
+        first = next(lines, None)
+        if (first is not None):
+            header = [value.strip() for value in first.split(delimiter)]
+            if (all(is_float(value) for value in header)):
+                lines = itertools.chain([first], lines)
+                if (fields is None):
+                    raise ValueError("File has no header, fields are required")
+            elif (fields is None):
+                fields = '|'.join(header)
+        
+        if (fields is None):
+            return
+        
+        columns = len(str.split(fields,"|"))
+        while True:
+            chunk = list(itertools.islice(lines, chunksize))
+            if (len(chunk) == 0):
+                if (chunksize is None):
+                    # header only
+                    yield Dataset(np.empty((0, columns)), fields)
+                break
+            yield Dataset(_parse_lines(chunk, columns, delimiter), fields)
+            if (chunksize is None):
+                break
+    finally:
+        if (handle is not filename):
+            handle.close()
+
+def _parse_lines(lines, columns, delimiter):
+    # parse all lines at once, falls back to genfromtxt for missing values 
+    # and ragged lines, which it reports
+    if (all(len(line.split(delimiter)) == columns for line in lines)):
+        text = ''.join(lines)
+        if (delimiter is not None):
+            text = text.replace(delimiter, ' ')
+        values = np.fromstring(text, sep=' ')
+        if (len(values) == len(lines)*columns):
+            return values.reshape(len(lines), columns)
+    
+    return np.genfromtxt(lines, delimiter=delimiter).reshape(len(lines), columns)
+
+def _end(column):
+    # index behind the last non-zero entry or None
+    nonzero = np.flatnonzero(np.asarray(column) != 0)
+    if (len(nonzero) == 0):
+        return None
+    return nonzero[-1] + 1
+
 class Ix(object):
     def __init__(self, n = False, s = False, e = False, b = False):
         self.n = n
@@ -385,11 +1597,9 @@ class Ix(object):
         if (not isinstance(e, (int, float, bool))):
             # try find last value
             try:
-                for i in range(0, len(e[:,n])):
-                    x = len(e[:,n]) - i - 1
-                    if (e[x,n] != 0):
-                        self.e = x + 1
-                        break
+                end = _end(e[:,n])
+                if (end is not None):
+                    self.e = end
             except:
                 self.e = len(e[:,n])
 
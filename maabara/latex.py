@@ -1,5 +1,11 @@
 from __init__ import *
 
+import re
+import numpy as np
+import uncertainties as uc
+
+from maabara.cache import manager
+
 def is_float(string):
     try:
         float(string)
@@ -7,6 +13,521 @@ def is_float(string):
     except:
         return False
 
+_ipython = []
+
+def ipython_display():
+    """
+    
+    Returns the ``IPython.display`` module or ``None`` if IPython is 
+    not available. The import is only tried once.
+    
+    """
+    if (len(_ipython) == 0):
+        try:
+            import IPython.display
+            _ipython.append(IPython.display)
+        except ImportError:
+            _ipython.append(None)
+    
+    return _ipython[0]
+
+_formats = manager.cache('formats')
+
+def format_ufloat(nominal, deviation, layout = '{:.1uL}'):
+    """
+    
+    Formats a value with deviation like ``layout.format(ufloat)``
+    
+    Results are memoized in the ``formats`` region of 
+    :data:`~maabara.cache.manager`.
+    
+    Parameters
+    ----------
+    nominal : float
+        Value
+    deviation : float
+        Deviation
+    layout : string, optional
+        Format of the ufloat
+    
+    Returns
+    -------
+    out : string
+        e.g. Latex markup ``2.4 \\pm 0.7``
+    
+    """
+    # hex keeps the sign of zero, -0.0 == 0.0 would share a key
+    key = (float(nominal).hex(), float(deviation).hex(), layout)
+    result = _formats.get(key)
+    if (result is None):
+        result = _formats.set(key, layout.format(uc.ufloat(nominal, deviation)))
+    
+    return result
+
+def format_ufloats(nominal, deviation, layout = '{:.1uL}'):
+    """
+    
+    Formats arrays of values with deviations, see :func:`~maabara.latex.format_ufloat`
+    
+    Parameters
+    ----------
+    nominal : array_like
+        Values
+    deviation : array_like or float
+        Deviations
+    layout : string or sequence, optional
+        Format of the ufloats
+    
+    Returns
+    -------
+    out : list of strings
+    
+    """
+    nominal, deviation, layout = np.broadcast_arrays(np.asarray(nominal, dtype=float), 
+                                                     np.asarray(deviation, dtype=float),
+                                                     np.asarray(layout, dtype=object))
+    
+    formatted = {}
+    result = []
+    for n, d, l in zip(nominal.ravel().tolist(), deviation.ravel().tolist(), layout.ravel().tolist()):
+        key = (n.hex(), d.hex(), l)
+        if (key not in formatted):
+            formatted[key] = format_ufloat(n, d, l)
+        result.append(formatted[key])
+    
+    return result
+
+class Formatter(object):
+    """
+    
+    Compiled cell formatting instruction of a table column
+    
+    The instruction is parsed once, afterwards whole columns are 
+    formatted at a time. See :func:`~maabara.latex.Table.add_column` 
+    for available functions.
+    
+    Parameters
+    ----------
+    function : string
+        Function name, e.g. ``num``
+    args : list of strings
+        Arguments, ``$x`` links to x. column of the data
+        
+    Examples
+    --------
+    >>> ma.latex.Formatter('num', ['$0', '$1'])([[0.5, 0.15], [2.4, 0.67]])
+    ['$0,5 \\pm 0,1$', '$2,4 \\pm 0,7$']
+    
+    """
+    
+    def __init__(self, function, args):
+        self.function = function
+        self.args = []
+        for arg in args:
+            if (str(arg)[0] == "$"):
+                try:
+                    self.args.append((True, int(str(arg)[1:])))
+                except ValueError:
+                    raise ValueError("Given column index does not exists: " + str(arg)[1:])
+            else:
+                # cast if numeric
+                if is_float(arg):
+                    if arg.find('.') == -1:
+                        arg = int(arg)
+                    else:
+                        arg = float(arg)
+                self.args.append((False, arg))
+    
+    def __call__(self, data):
+        """
+        
+        Format a column
+        
+        Parameters
+        ----------
+        data : array_like or Column
+            Rows of data
+            
+        Returns
+        -------
+        out : list
+            Cell contents
+        
+        """
+        rows = len(data)
+        
+        args = []
+        for column, arg in self.args:
+            if (column):
+                try:
+                    if (isinstance(data, Column)):
+                        arg = data.column(arg)
+                    else:
+                        arg = [data[row][arg] for row in range(rows)]
+                except IndexError:
+                    raise ValueError("Given column index does not exists: " + str(arg))
+            else:
+                arg = [arg] * rows
+            args.append(arg)
+        
+        if (self.function in _formatters):
+            return _formatters[self.function](*args)
+        
+        # any other function is applied cell by cell
+        function = eval(self.function)
+        return [function(*cell) for cell in zip(*args)]
+
+def _num(nominal, deviation = None, layout = None):
+    rows = len(nominal)
+    if (deviation is None):
+        deviation = ['False'] * rows
+    if (layout is None):
+        layout = ['{:.1uL}'] * rows
+    
+    # numeric deviations are valid at once, otherwise check once per distinct value
+    if (np.asarray(deviation).dtype.kind in 'biuf'):
+        valid = [True] * rows
+    else:
+        checked = {}
+        for d in deviation:
+            if (d not in checked):
+                checked[d] = is_float(d)
+        valid = [checked[d] for d in deviation]
+    
+    index = [i for i in range(rows) if valid[i]]
+    formatted = format_ufloats([float(nominal[i]) for i in index], [float(deviation[i]) for i in index], 
+                               [layout[i] for i in index])
+    
+    result = ['\\num{' + str(nominal[i]) + '}' for i in range(rows)]
+    for i, tex in zip(index, formatted):
+        result[i] = "$" + tex + "$"
+    
+    return [cell.replace('.', ',') for cell in result]
+
+def _uc(value, layout = None):
+    return _num([v.n for v in value], [v.s for v in value], layout)
+
+def _lit(lit, value, dev = None):
+    from maabara.data import literature_value
+    if (dev is None):
+        dev = 0
+    else:
+        dev = np.asarray(dev, dtype=float)
+    return literature_value(np.asarray(lit, dtype=float), np.asarray(value, dtype=float), dev, "tex!")
+
+def _rnd(value, digits):
+    # the round builtin, distinct values are rounded once
+    rounded = {}
+    result = []
+    for v, d in zip(value, digits):
+        # repr keeps the sign of zero, -0.0 == 0.0 would share a key
+        key = (repr(v), d)
+        if (key not in rounded):
+            rounded[key] = round(v, d)
+        result.append(rounded[key])
+    
+    return _num(result)
+
+_formatters = {'num': _num, 'uc': _uc, 'lit': _lit, 'rnd': _rnd}
+
+class Column(object):
+    """
+    
+    Table column holding raw data and its format instruction
+    
+    Data is kept as typed array, cells are formatted on demand and 
+    cached until the format changes.
+    
+    Parameters
+    ----------
+    data : array_like
+        Rows of data, a flat sequence is one value per row
+    function : mixed, optional
+        Format instruction, see :func:`~maabara.latex.Table.add_column`
+    title : string, optional
+        Column caption
+    
+    """
+    
+    def __init__(self, data, function = False, title = ''):
+        # python scalars are restored when rendering, so cells read like before
+        self.native = not isinstance(data, np.ndarray)
+        
+        # transpose to column
+        try:
+            data[0][0]
+            if (isinstance(data[0],str)):
+                raise TypeError
+        except:
+            data = [[data[i]] for i in range(len(data))]
+        
+        self.values = _typed_array(data, not self.native or _same_type(data))
+        self.title = title
+        self.set_format(function)
+    
+    def set_format(self, function = False):
+        """
+        
+        Set format instruction, see :func:`~maabara.latex.Table.add_column`
+        
+        """
+        self.function = function
+        self.formatter = None
+        if (function != False):
+            name, args = Table._function_from_string(function)
+            self.formatter = Formatter(name, args)
+            
+            for column, arg in self.formatter.args:
+                # empty data has no width yet
+                if (column and arg >= self.values.shape[1] and len(self.values) > 0):
+                    raise ValueError("Given column index does not exists: " + str(arg))
+        
+        self.cells = None
+        self.plain = None
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def column(self, index):
+        """
+        
+        Returns the values of a data column as list
+        
+        """
+        if (len(self.values) == 0):
+            return []
+        if (index >= self.values.shape[1]):
+            raise IndexError(index)
+        
+        values = self.values[:,index]
+        if (self.native or values.dtype == object):
+            return values.tolist()
+        return list(values)
+    
+    def format(self):
+        """
+        
+        Returns formatted cell contents
+        
+        Returns
+        -------
+        out : list of strings
+        
+        """
+        if (self.cells is None):
+            if (self.formatter is None):
+                cells = self.column(0)
+            else:
+                cells = self.formatter(self)
+            self.cells = [str(cell) for cell in cells]
+        
+        return self.cells
+    
+    def append(self, data):
+        """
+        
+        Append rows of data, only the new rows are formatted
+        
+        Parameters
+        ----------
+        data : array_like
+            Rows of data, a flat sequence is one value per row
+        
+        """
+        part = Column(data, self.function, self.title)
+        
+        if (self.values.dtype == part.values.dtype and self.values.shape[1] == part.values.shape[1]):
+            self.values = np.concatenate([self.values, part.values])
+        else:
+            # keep the types of present values, cells read the same with or without cache
+            self.values = _typed_array(self.values.tolist() + part.values.tolist(), False)
+        
+        if (self.cells is not None):
+            self.cells.extend(part.format())
+        if (self.plain is not None):
+            self.plain.extend(part.text())
+    
+    def rows(self, start, stop):
+        """
+        
+        Returns a column holding the rows ``start:stop`` with the same format
+        
+        """
+        import copy
+        
+        part = copy.copy(self)
+        part.values = self.values[start:stop]
+        part.cells = None if self.cells is None else self.cells[start:stop]
+        part.plain = None if self.plain is None else self.plain[start:stop]
+        
+        return part
+    
+    def text(self):
+        """
+        
+        Returns cell contents as plain text, derived from the 
+        formatted Latex cells
+        
+        Returns
+        -------
+        out : list of strings
+        
+        """
+        if (self.plain is None):
+            self.plain = [plain_text(cell) for cell in self.format()]
+        
+        return self.plain
+
+def _format_block(column):
+    # worker task, formats one row block of a column
+    return column.format()
+
+def _typed_array(rows, numeric = True):
+    # numeric data as typed array, anything else as object array
+    if (numeric):
+        try:
+            values = np.asarray(rows)
+            if (values.ndim == 2 and values.dtype.kind in 'biufc'):
+                return values
+        except ValueError:
+            pass
+    
+    width = max([len(row) for row in rows] or [0])
+    values = np.empty((len(rows), width), dtype=object)
+    values.fill('')
+    for i, row in enumerate(rows):
+        values[i,:len(row)] = list(row)
+    
+    return values
+
+def _same_type(rows):
+    # python values of mixed types are not cast, e.g. ints among floats
+    return len(set(type(value) for row in rows for value in row)) <= 1
+
+_plain_rules = [
+    (re.compile(r'\\num\{([^}]*)\}'), r'\1'),
+    (re.compile(r'\s*\\times\s*10\^\{([^}]*)\}'), r'e\1'),
+    (re.compile(r'\s*\\pm\s*'), ' +/- '),
+    (re.compile(r'\\(left|right)'), ''),
+    (re.compile(r'\\mathrm\{([^}]*)\}'), r'\1'),
+    (re.compile(r'\\infty'), 'inf'),
+    (re.compile(r'\\%'), '%'),
+    (re.compile(r'\$'), ''),
+]
+
+def plain_text(tex):
+    """
+    
+    Converts formatted Latex cell markup into plain text
+    
+    Examples
+    --------
+    >>> ma.latex.plain_text('$\\left(1,2 \\pm 0,1\\right) \\times 10^{5}$')
+    '(1,2 +/- 0,1)e5'
+    
+    """
+    for pattern, replacement in _plain_rules:
+        tex = pattern.sub(replacement, tex)
+    
+    return tex
+
+class _LatexWriter(object):
+    text = False
+    
+    def __init__(self, table, stream):
+        self.table = table
+        self.stream = stream
+        
+    def head(self):
+        if (self.table.embedding):
+            head, self.end = self.table.environment()
+            self.stream.write(head)
+
+        # header
+        if self.table.headline:
+            header = ' & '.join(self.table.header) + "\\\\\n\\hline\n"
+            self.stream.write(header)
+            if (self.table.longtable):
+                # caption and label on the first page, later pages repeat the header
+                self.stream.write("\\endfirsthead\n")
+                if (self.table.embedding):
+                    if (self.table.caption != ''):
+                        self.stream.write('\\caption[]{' + self.table.caption + '}\\\\')
+                    if (self.table.circline):
+                        self.stream.write('\n \\hline\n')
+                self.stream.write(header + "\\endhead\n")
+    
+    def rows(self, markup, plain, last):
+        block = '\\\\\n\\hline\n'.join(markup)
+        if (last):
+            block += "\\\\\n"
+        else:
+            block += '\\\\\n\\hline\n'
+        self.stream.write(block)
+    
+    def foot(self):
+        if (self.table.embedding):
+            self.stream.write(self.end)
+
+class _CsvWriter(_LatexWriter):
+    text = True
+    
+    def head(self):
+        import csv
+        self.writer = csv.writer(self.stream)
+        if self.table.headline:
+            self.writer.writerow([plain_text(title) for title in self.table.header])
+    
+    def rows(self, markup, plain, last):
+        self.writer.writerows(plain)
+    
+    def foot(self):
+        pass
+
+class _MarkdownWriter(_LatexWriter):
+    text = True
+    
+    def head(self):
+        titles = [''] * len(self.table.header)
+        if self.table.headline:
+            titles = [plain_text(title) for title in self.table.header]
+        self.stream.write(self._line(titles) + '|' + '---|' * len(titles) + '\n')
+    
+    def rows(self, markup, plain, last):
+        self.stream.write(''.join([self._line(row) for row in plain]))
+    
+    def foot(self):
+        pass
+    
+    def _line(self, row):
+        return '| ' + ' | '.join([cell.replace('|', '\\|') for cell in row]) + ' |\n'
+
+class _HtmlWriter(_LatexWriter):
+    text = True
+    
+    def head(self):
+        self.stream.write('<table>\n')
+        if (self.table.caption != ''):
+            self.stream.write('<caption>' + _html(plain_text(self.table.caption)) + '</caption>\n')
+        if self.table.headline:
+            self.stream.write(self._line([plain_text(title) for title in self.table.header], 'th'))
+    
+    def rows(self, markup, plain, last):
+        self.stream.write(''.join([self._line(row) for row in plain]))
+    
+    def foot(self):
+        self.stream.write('</table>\n')
+    
+    def _line(self, row, tag = 'td'):
+        return ('<tr>' + ''.join(['<' + tag + '>' + _html(cell) + '</' + tag + '>' for cell in row]) 
+                + '</tr>\n')
+
+def _html(text):
+    import cgi
+    return cgi.escape(text).replace('+/-', '&plusmn;')
+
+_writers = {'latex': _LatexWriter, 'csv': _CsvWriter, 'markdown': _MarkdownWriter, 'html': _HtmlWriter}
+
 class Table(object):
     """
     
@@ -27,8 +548,10 @@ class Table(object):
         out : boolean
             True on success.
         """
-        self.data = []
+        self.columns = []
         self.header = []
+        self.markup = []
+        self.rendered = {}
         
         #options
         self.caption = ''
@@ -39,6 +562,8 @@ class Table(object):
         self.circline = True
         self.embedding = True
         self.placement = '[!htb]'
+        self.longtable = False
+        self.row_cache = False
         
         return True
     
@@ -69,6 +594,28 @@ class Table(object):
         """
         self.set('embedding', False)
     
+    def use_longtable(self, longtable = True):
+        """
+        
+        Use a ``longtable`` environment instead of ``table`` and ``tabular``.
+        Very large tables break across pages and repeat their head row,
+        caption and label are set on the first page only. Requires ``\\usepackage{longtable}``.
+        
+        """
+        self.set('longtable', longtable)
+    
+    def use_row_cache(self, cache = True):
+        """
+        
+        Keep formatted cells and the markup of every row in memory.
+        Tables rendered again, e.g. after :func:`~maabara.latex.Table.append_rows`, 
+        only format changed rows then. By default rows are formatted 
+        in chunks while writing and dropped afterwards.
+        
+        """
+        self.set('row_cache', cache)
+        self._invalidate()
+    
     def no_headline(self):
         """
         
@@ -113,11 +660,8 @@ class Table(object):
             two empty arrays with the corresponding dimensions are returned.
         
         """
-        rows = len(self.data)
-        try:
-            cols = len(self.data[0])
-        except:
-            cols = 0
+        rows = max([len(column) for column in self.columns] or [0])
+        cols = len(self.columns)
             
         if (array_return):
             e = ''
@@ -132,7 +676,8 @@ class Table(object):
             
         return rows, cols
     
-    def _args_from_string(self,string, default_func_name = ''):
+    @staticmethod
+    def _args_from_string(string, default_func_name = ''):
         #@todo allow inner function calls with eval
         string = string.split(")")[0]
         if (len(string) == 0):
@@ -146,11 +691,12 @@ class Table(object):
             args.insert(0, func[0])
         return args
     
-    def _function_from_string(self, function, default = 'num'):
+    @staticmethod
+    def _function_from_string(function, default = 'num'):
         if (function == False):
             return False, []
         
-        args = self._args_from_string(function, default) 
+        args = Table._args_from_string(function, default) 
         
         #if (not args[0] in ['num','lit', 'rnd']):
             #raise ValueError('Unknown function name: ' + name)
@@ -172,13 +718,15 @@ class Table(object):
 
         Parameters
         ----------
-        data : array_like
+        data : array_like or Dataset
             Data set
         function : mixed
             If False ``data`` will be added unchanged.
         
             If String it sets instructions how to render ``data`` into each cell, 
             e.g. ``example($0,1)``. ``$x`` will link to x. column of dataset.
+            Columns of a :class:`~maabara.data.Dataset` can be linked by 
+            name, e.g. ``num($x,$x%)``.
             
             Available functions:
             
@@ -205,79 +753,118 @@ class Table(object):
             Sets a column caption
         
         """
-        def dynamic_value(arg, row):
-            if (str(arg)[0] == "$"):
-                try:
-                    col = int(str(arg)[1:])
-                    return data[row][col]
-                except:
-                    raise ValueError("Given column index does not exists: " + str(col))
-            else:
-                # cast if numeric
-                dot = arg.find('.')
-                if is_float(arg):
-                    if dot == -1:
-                        arg = int(arg)
-                    else:
-                        arg = float(arg)
-                        
-                return arg
-
-        def num(nominal, deviation = 'False', layout = '{:.1uL}'):
-            result = '\\num{' + str(nominal) + '}'
-            if (is_float(deviation)):
-                import uncertainties as uc
-                tmp = uc.ufloat(float(nominal), float(deviation))
-                result = "$" + layout.format(tmp) + "$"
-
-            return result.replace('.', ',')
-
-        def lit(lit, value, dev = 0):
-            from maabara.data import literature_value
-            return literature_value(lit, value, dev, "tex!")
+        from maabara.data import Dataset
+        if (isinstance(data, Dataset)):
+            # link columns by name
+            fields = str.split(data.fields(), '|')
+            if (function != False):
+                def index(match):
+                    if (match.group(1) not in fields):
+                        raise ValueError("Given column does not exists: " + match.group(1))
+                    return '$' + str(fields.index(match.group(1)))
+                function = re.sub(r'\$([A-Za-z_]\w*%?)', index, function)
+            data = data.array()
         
-        def rnd(value, digits):
-            return num(round(value, digits))
+        self.columns.append(Column(data, function, title))
+        self._invalidate()
         
-        def uc(value, layout = '{:.1uL}'):
-            return num(value.n, value.s, layout)
-
-        # transpose to column
-        try:
-            data[0][0]
-            if (isinstance(data[0],str)):
-                raise
-        except:
-            data = [[data[i]] for i in range(len(data))]
+        # set title
+        self.header.append(title)
+    
+    def append_rows(self, rows):
+        """
         
-        rows, cols = self.dimensions()
-        function, args = self._function_from_string(function)
-
-        for row in range(len(data)):
-            # generate cell content
-            if (function == False):
-                cell = data[row][0]
-            else:
-                tmp = [dynamic_value(args[i],row) for i in range(len(args))]
-                cell = eval(function + "(*tmp)")
-            
-            # expand array if needed
-            space = []
-            for i in range(cols):
-                space.append('')
-                
-            if (row >= len(self.data)):
-                self.data.append(space)
+        Append rows of data to the columns
+        
+        If the row cache is used only the new rows are formatted when 
+        the table is rendered again, see :func:`~maabara.latex.Table.use_row_cache`.
+        
+        Parameters
+        ----------
+        rows : array_like
+            Rows holding one entry per column. The entry is the data 
+            of the column, e.g. ``[value, deviation]`` for ``num($0,$1)``
             
-            self.data[row].append(str(cell))
+        Examples
+        --------
+        >>> tbl.add_column([[2.4, 0.7]], 'num($0,$1)', 'U')
+        >>> tbl.add_column([1], False, 'n')
+        >>> tbl.append_rows([[[2.6, 0.3], 2], [[2.5, 0.2], 3]])
         
-        # fill up with empty cells if needed
-        if (len(self.data) > len(data)):
-            for i in range(len(data),len(self.data)):
-                self.data[i].append('')
+        """
+        if (len(rows) == 0):
+            return
         
-        # set title
-        self.header.append(title)
+        for row in rows:
+            if (len(row) != len(self.columns)):
+                raise ValueError('Rows need one entry per column: ' + str(len(self.columns)))
+        
+        start = self.dimensions()[0]
+        if (any(len(column) != start for column in self.columns)):
+            raise ValueError('Rows can only be appended to columns of equal length')
+        
+        for i, column in enumerate(self.columns):
+            column.append([row[i] for row in rows])
+        self._invalidate(start)
+    
+    def _invalidate(self, start = 0):
+        # forget the cached markup of the rows from start on
+        del self.markup[start:]
+        self.rendered = {}
+    
+    def _rendered(self, format):
+        # complete markup, cached until data or options change
+        state = (self.caption, self.label, self.headline, self.align, self.center, 
+                 self.circline, self.embedding, self.placement, self.longtable, 
+                 tuple(self.header))
+        if (format not in self.rendered or self.rendered[format][0] != state):
+            self.rendered[format] = (state, self.text(format))
+        
+        return self.rendered[format][1]
+    
+    def _repr_latex_(self):
+        return self._rendered('latex')
+    
+    def _repr_html_(self):
+        return self._rendered('html')
+    
+    def _markup(self, start, stop):
+        # Latex markup of rows of the row cache, kept until invalidated
+        if (len(self.markup) < stop):
+            cells = self._cells(len(self.markup), stop)
+            self.markup.extend([' & '.join(row) for row in zip(*cells)])
+        
+        return self.markup[start:stop]
+    
+    def set_format(self, index, function = False, title = None):
+        """
+        
+        Change the format instruction of a column
+        
+        Cells are formatted when rendered, so the table can be 
+        rendered again with another precision or layout without 
+        adding the data again.
+        
+        Parameters
+        ----------
+        index : int
+            Column index
+        function : mixed
+            See :func:`~maabara.latex.Table.add_column`
+        title : string, optional
+            New column caption
+            
+        Examples
+        --------
+        >>> tbl.add_column(results, 'num($0,$1)', 'Results')
+        >>> tbl.set_format(0, 'num($0,$1,{:.2uL})')
+        
+        """
+        self.columns[index].set_format(function)
+        self._invalidate()
+        if (title is not None):
+            self.columns[index].title = title
+            self.header[index] = title
 
     def set_data(self, data):
         """
@@ -287,6 +874,7 @@ class Table(object):
         Parameters
         ----------
         data : array_like
+            Rows of cell contents. Replaces all columns.
         
         Returns
         -------
@@ -295,7 +883,11 @@ class Table(object):
         
         """
         if (len(data) > 0):
-            self.data = data
+            rows = _typed_array(data, isinstance(data, np.ndarray) or _same_type(data))
+            self.columns = [Column(rows[:,[i]]) for i in range(rows.shape[1])]
+            for column in self.columns:
+                column.native = True
+            self._invalidate()
             return True
 
     def get_data(self):
@@ -306,12 +898,70 @@ class Table(object):
         Returns
         -------
         out : array
-            Data
+            Rows of formatted cell contents
         
         """
         return self.data
+    
+    @property
+    def data(self):
+        rows, cols = self.dimensions()
+        return [list(row) for row in zip(*self._cells())] if cols > 0 else []
+    
+    @data.setter
+    def data(self, data):
+        self.columns = []
+        self._invalidate()
+        self.set_data(data)
+    
+    def _cells(self, start = 0, stop = None, text = False):
+        # formatted cells of each column padded to the row count
+        rows, cols = self.dimensions()
+        if (stop is None or stop > rows):
+            stop = rows
+        
+        result = []
+        for column in self.columns:
+            if (not self.row_cache and column.cells is None):
+                # format only the requested rows, nothing is kept
+                column = column.rows(start, stop)
+                cells = column.text() if text else column.format()
+            else:
+                cells = (column.text() if text else column.format())[start:stop]
+            result.append(cells + [''] * (stop - start - len(cells)))
+        
+        return result
+    
+    def _format(self, workers = 1, chunk = 1000):
+        # fill the cell caches of all columns, row blocks are formatted in a process pool,
+        # returns the filled columns
+        if (workers == 1):
+            return []
+        
+        from maabara.data import _map
+        
+        # raw columns are cheaper to format in place
+        columns = [column for column in self.columns 
+                   if column.cells is None and column.formatter is not None]
+        
+        tasks = []
+        for column in columns:
+                for start in range(0, len(column), chunk):
+                    tasks.append((column, column.rows(start, start + chunk)))
+        
+        if (len(tasks) == 0):
+            return []
+        
+        blocks = _map(_format_block, [part for column, part in tasks], workers)
+        
+        for column in columns:
+            column.cells = []
+        for (column, part), cells in zip(tasks, blocks):
+            column.cells.extend(cells)
+        
+        return columns
 
-    def latex(self, data = []):
+    def latex(self, data = [], workers = 1):
         """
         
         Get Latex table markup
@@ -320,6 +970,8 @@ class Table(object):
         ----------
         data : array_like, optional
             See :func:`~maabara.latex.set_data`
+        workers : int, optional
+            Number of processes formatting the cells
         
         Returns
         -------
@@ -327,31 +979,142 @@ class Table(object):
             Latex table markup
         
         """
+        import StringIO
         
-        self.set_data(data)
-
-        result = ""
+        result = StringIO.StringIO()
+        self.write(result, data, workers = workers)
 
-        # header
-        if self.headline:
-            result += ' & '.join(self.header) + "\\\\\n\\hline\n"
+        return result.getvalue()
+    
+    def write(self, stream, data = [], chunk = 1000, workers = 1):
+        """
+        
+        Write Latex table markup to a file-like object
+        
+        Rows are rendered and written in chunks, the complete markup 
+        is not held in memory unless the row cache is used, see 
+        :func:`~maabara.latex.Table.use_row_cache`. With several 
+        ``workers`` the formatted cells of all rows are collected first 
+        and dropped after writing.
+        
+        Parameters
+        ----------
+        stream : file-like
+            Object with a ``write`` method
+        data : array_like, optional
+            See :func:`~maabara.latex.set_data`
+        chunk : int, optional
+            Number of rows written at once
+        workers : int, optional
+            Number of processes formatting the cells
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+        
+        """
+        return self.render({'latex': stream}, data, chunk, workers)
+    
+    def render(self, outputs, data = [], chunk = 1000, workers = 1):
+        """
+        
+        Write the table in several formats in one pass over the data
+        
+        Each cell is formatted once, the formats share the cell 
+        contents of :func:`~maabara.latex.Table.add_column` functions.
+        
+        Parameters
+        ----------
+        outputs : dict
+            Maps format names ``latex``, ``csv``, ``markdown`` or ``html`` 
+            to file-like objects
+        data : array_like, optional
+            See :func:`~maabara.latex.set_data`
+        chunk : int, optional
+            Number of rows written at once
+        workers : int, optional
+            Number of processes formatting the cells. Row blocks of 
+            ``chunk`` rows are formatted in a process pool and joined 
+            in order, the output equals the serial one.
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+            
+        Examples
+        --------
+        >>> with open('t.tex', 'w') as tex, open('t.csv', 'w') as csv, open('t.html', 'w') as html:
+        ...     tbl.render({'latex': tex, 'csv': csv, 'html': html})
+        
+        """
+        self.set_data(data)
+        
+        writers = []
+        for name, stream in outputs.items():
+            if (name not in _writers):
+                raise ValueError('Invalid format: ' + name)
+            writers.append(_writers[name](self, stream))
+        
+        filled = self._format(workers, chunk)
+        try:
+            self._write(writers, chunk)
+        finally:
+            if (not self.row_cache):
+                # cells of the process pool are kept for this render only
+                for column in filled:
+                    column.cells = None
+                    column.plain = None
+        
+        return True
+    
+    def _write(self, writers, chunk):
+        # one pass over the rows for all writers
+        text = any(writer.text for writer in writers)
+        markup = not all(writer.text for writer in writers)
+        
+        for writer in writers:
+            writer.head()
 
         # process the lines
-        for row in range(len(self.data)):
-            
-            result += ' & '.join(self.data[row])
-            
-            if (row < len(self.data) - 1):
-                result += '\\\\\n\\hline\n'
+        rows, cols = self.dimensions()
+        for start in range(0, rows, chunk):
+            stop = min(start + chunk, rows)
+            if (self.row_cache):
+                lines = self._markup(start, stop) if markup else None
+                plain = zip(*self._cells(start, stop, True)) if text else None
             else:
-                result += "\\\\\n"
-
+                # format the chunk once for all outputs
+                cells = self._cells(start, stop)
+                lines = [' & '.join(row) for row in zip(*cells)] if markup else None
+                plain = zip(*[[plain_text(cell) for cell in column] for column in cells]) if text else None
+            for writer in writers:
+                writer.rows(lines, plain, start + chunk >= rows)
 
-        if (self.embedding):
-                head, foot = self.environment()	
-                result = head + result + foot
+        for writer in writers:
+            writer.foot()
+    
+    def text(self, format = 'csv'):
+        """
+        
+        Get table markup in another format
+        
+        Parameters
+        ----------
+        format : {'csv', 'markdown', 'html', or 'latex'}
+        
+        Returns
+        -------
+        out : string
+        
+        """
+        import StringIO
+        
+        result = StringIO.StringIO()
+        self.render({format: result})
 
-        return result
+        return result.getvalue()
     
     def environment(self): 
         """
@@ -368,6 +1131,32 @@ class Table(object):
             circ = '\n \\hline\n'
         else:
             circ = ''
+    
+        pos = ''
+        sep = ''
+        
+        for i in range(len(self.columns)):
+            pos += sep + self.align
+            sep = '|'
+        
+        if (self.longtable):
+            # longtable breaks across pages and repeats the header
+            head = '\\begin{longtable}'
+            if pos != '':
+                head += '{|' + pos + '|}'
+            
+            if (self.caption != '' or self.label != ''):
+                head += '\n'
+                if (self.caption != ''):
+                    head += '\\caption{' + self.caption + '}'
+                if (self.label != ''):
+                    head += '\\label{' + self.label + '}'
+                head += '\\\\'
+            
+            head += circ
+            foot = circ + '\\end{longtable}'
+            
+            return head, foot
 
         # head
         head = '\\begin{table}' + self.placement + '\n'
@@ -376,18 +1165,6 @@ class Table(object):
             head += '\\centering\n'
     
         head += '\\begin{tabular}'
-    
-        pos = ''
-        sep = ''
-        
-        try:
-            length = len(self.data[0])
-        except:
-            length = 0
-        
-        for i in range(length):
-            pos += sep + self.align
-            sep = '|'
             
         if pos != '':
             head += '{|' + pos + '|}'
@@ -408,31 +1185,106 @@ class Table(object):
         return head, foot
 
     
-    def export(self, file):
+    def page(self, index, rows):
+        """
+        
+        Get a page of the table as independent table
+        
+        The page holds ``rows`` rows of data and repeats the header, 
+        caption and label are suffixed with the page number.
+        
+        Parameters
+        ----------
+        index : int
+            Page number starting at 0
+        rows : int
+            Rows per page
+        
+        Returns
+        -------
+        out : Table
+        
+        """
+        import copy
+        
+        count = self.pages(rows)
+        if (index < 0 or index >= count):
+            raise IndexError(index)
+        
+        page = copy.copy(self)
+        page.columns = [column.rows(index * rows, (index + 1) * rows) for column in self.columns]
+        page.header = list(self.header)
+        page.markup = self.markup[index * rows:(index + 1) * rows]
+        page.rendered = {}
+        
+        if (self.caption != ''):
+            page.caption = self.caption + ' (' + str(index + 1) + '/' + str(count) + ')'
+        if (self.label != ''):
+            page.label = self.label + '-' + str(index + 1)
+        
+        return page
+    
+    def pages(self, rows):
+        """
+        
+        Number of pages holding ``rows`` rows each
+        
+        """
+        if (rows < 1):
+            raise ValueError('Rows per page must be positive: ' + str(rows))
+        
+        return max(1, -(-self.dimensions()[0] // rows))
+    
+    def export(self, file, workers = 1, rows = None):
         """
         
         Saves Latex table markup to file
         
+        The markup is streamed to disk, see :func:`~maabara.latex.Table.write`
+        
         Parameters
         ----------
         file : string
             Filename
+        workers : int, optional
+            Number of processes formatting the cells
+        rows : int, optional
+            Rows per page. If given, every page is saved to its own 
+            file, e.g. ``table-1.tex``, see :func:`~maabara.latex.Table.page`
         
         Returns
         -------
         out : mixed
-            Latex ``\input`` command or ``False`` on failure
+            Latex ``\input`` command or ``False`` on failure. List of 
+            commands if paginated.
+            
+        Examples
+        --------
+        >>> tbl.export('table.tex', rows = 40)
+        ['\\input{table-1.tex}', '\\input{table-2.tex}']
         
         """
-
-        result = self.latex()
+        if (rows is not None):
+            import os
+            
+            root, ext = os.path.splitext(file)
+            result = []
+            for index in range(self.pages(rows)):
+                name = root + '-' + str(index + 1) + ext
+                if (self.page(index, rows).export(name, workers) == False):
+                    return False
+                result.append('\\input{' + name + '}')
+            
+            return result
         
         try:
             text_file = open(file, "w")
-            text_file.write(result)
-            text_file.close()
-        except:
+        except IOError:
             return False
-            
+        
+        try:
+            self.write(text_file, workers = workers)
+        finally:
+            text_file.close()
 
-        return '\\input{' + file + '}'
\ No newline at end of file
+        return '\\input{' + file + '}'
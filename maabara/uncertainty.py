@@ -4,6 +4,60 @@ import sympy as sy
 import numpy as np
 import uncertainties as uc
 
+from maabara.cache import manager
+
+_derivations = manager.cache('derivations')
+
+_formats = manager.cache('formats')
+
+def _status(expr):
+    # why an expression could not be evaluated to a float
+    if (len(getattr(expr, 'free_symbols', ())) > 0):
+        return 'missing'
+    return 'nonfinite'
+
+def _derive(eq_expr, symbols):
+    # symbolic error equation for the symbols with deviation, shared by all sheets
+    key = (eq_expr, symbols)
+    err_expr = _derivations.get(key)
+    if (err_expr is not None):
+        return err_expr
+    
+    err_expr = 0
+    for symbol in symbols:
+        # derivative times error variable
+        err_expr = err_expr + (sy.diff(eq_expr, symbol) * sy.Symbol('sigma_' + symbol))**2
+    
+    # square root
+    err_expr = sy.simplify(sy.sqrt(err_expr))
+
+    # force rooting
+    err_expr = sy.powdenest(err_expr, force=True)
+    
+    return _derivations.set(key, err_expr)
+
+def _equation_tex(eq_expr, err_expr, aliases, multiply):
+    # Latex of equation and error with symbols replaced by their alias markup, 
+    # cached since sy.latex is slow
+    key = ('equation', eq_expr, err_expr, aliases, multiply)
+    result = _formats.get(key)
+    if (result is not None):
+        return result
+    
+    eq_tex = sy.latex(eq_expr, mul_symbol=multiply)
+    error_tex = sy.latex(err_expr, mul_symbol=multiply)
+    
+    if (len(aliases) > 0):
+        # replace all symbols in one pass, longest first
+        names = dict((sy.latex(sy.sympify(str(symbol))), tex) for symbol, tex in aliases)
+        pattern = re.compile(r'(?<!\w)(?:' + '|'.join([re.escape(name) for name in 
+                             sorted(names, key=len, reverse=True)]) + r')(?!\w)')
+        replace = lambda match: names[match.group(0)]
+        eq_tex = pattern.sub(replace, eq_tex)
+        error_tex = pattern.sub(replace, error_tex)
+    
+    return _formats.set(key, (eq_tex, error_tex))
+
 class Sheet(object):
     """
     
@@ -47,8 +101,13 @@ class Sheet(object):
         self.nominal = 0
         self.deviation = 0
         self.ufloat = False
+        self.changed = True
+        self.rendered = (None, None)
         
-    	self.messages = []
+        self.status = 'ok'
+        self.quiet = False
+        self.diagnostics = None
+    	self.messages = set()
         
         return True
     
@@ -102,6 +161,7 @@ class Sheet(object):
         """
         if (isinstance(equation, str) & (equation != "")):
             self.changed_equation = True
+            self.changed = True
             equation = equation.replace('_','')
             self.equation = equation
             self.eq_expr = sy.sympify(equation)
@@ -139,6 +199,7 @@ class Sheet(object):
         """
         if (len(data) > 0):
         	self.data = data
+        	self.changed = True
         	return True
             
     def get_data(self, line = False, element = False):
@@ -210,6 +271,7 @@ class Sheet(object):
 		tex = sy.latex(sy.sympify(symbol))
 
         val = (symbol_replaced, value, error, tex)
+        self.changed = True
         
         index = self._find_in_list(self.data, symbol)
         if (index == -1):
@@ -255,32 +317,11 @@ class Sheet(object):
         no_deviation = []
         
         if (self.changed_equation):
-            self.err_expr = 0
-
             for var in self.data:
-                #define symbol
-                exec(var[0] + " = sy.Symbol('" + var[0] + "')")
-
-
                 if len(var) >= 2 and isinstance(var[2], bool) and var[2] == False:
                     no_deviation.append(var[0])
-                else:
-                    # get derivative
-                    exec(var[0] + "_der = sy.diff(self.eq_expr,var[0])")
-
-                    # set error variable
-                    exec(var[0] + "_err = sy.Symbol('sigma_" + var[0] + "')")
-                    exec(var[0] + "_der = " + var[0] + "_der * " + var[0] + "_err")
-
-                    # chunk
-                    exec("self.err_expr = self.err_expr + (" + var[0] + "_der)**2")
-
-            # square root
-            self.err_expr = sy.simplify(sy.sqrt(self.err_expr))
-
-            # force rooting
-            self.err_expr = sy.powdenest(self.err_expr, force=True)
             
+            self.err_expr = _derive(self.eq_expr, tuple([var[0] for var in self.data if var[0] not in no_deviation]))
             self.changed_equation = False
 
         # error propagation if given
@@ -304,23 +345,33 @@ class Sheet(object):
                 except:
                     pass
 
+        self.status = 'ok'
         try:
             self.nominal = float(nominal)
         except:
-	    self._msg("Could not finish nominal evalution due to missing values, stopped in at \n" + str(nominal), 'warning')
+            self.status = _status(nominal)
+            if (not self.quiet):
+                self._msg("Could not finish nominal evalution due to missing values, stopped in at \n" + str(nominal), 'warning')
             self.nominal = 0
             
         try:
             self.deviation = float(deviation)
         except:
-	    self._msg("Could not finish deviation evalution due to missing values, stopped in at \n" + str(deviation), 'warning')
+            if (self.status == 'ok'):
+                self.status = _status(deviation)
+            if (not self.quiet):
+                self._msg("Could not finish deviation evalution due to missing values, stopped in at \n" + str(deviation), 'warning')
             self.deviation = 0
+        
+        if (self.status == 'ok' and not (np.isfinite(self.nominal) and np.isfinite(self.deviation))):
+            self.status = 'nonfinite'
             
         if (len(no_deviation) > 0):
             self._msg("No deviation for " + ', '.join(no_deviation))
         
         # cast to uncertainties
         self.ufloat = uc.ufloat(self.nominal,self.deviation)
+        self.changed = False
         
         return self.eq_expr, self.err_expr, self.ufloat
 
@@ -343,53 +394,82 @@ class Sheet(object):
             Result
         """
         
-        self.run()
-        
-        # outs
-        result_tex = '{:.1uL}'.format(self.ufloat)
-        if (self.name != ""):
-            result_tex = self.name + "=" + result_tex
-
-        eq_tex = sy.latex(self.eq_expr, mul_symbol=multiply)
-        if (self.name != ""):
-            eq_tex = self.name + "=" + eq_tex
-
-        error_tex = sy.latex(self.err_expr, mul_symbol=multiply)
-        if (self.name != ""):
-            error_tex = "\sigma_{" + self.name + "}" + "=" + error_tex
-
-	# replace alias
-	for var in self.data:
- 	    if (len(var) == 4):
-		if (var[3] != False):
-		    var0 = sy.latex(sy.sympify(str(var[0])))
-                    # secure replacement
-                    subs = var[3]
-                    eq_tex = re.sub(r'\b' + var0 + r'\b', subs.encode('string-escape'), eq_tex)
-		    error_tex = re.sub(r'\b' + var0 + r'\b', subs.encode('string-escape'), error_tex)
-
-        def pdisplay(tex):
-            IPython.display.display((IPython.display.Math(tex)))
-            print tex + '\n'
-            
+        eq_tex, result_tex, error_tex = self.latex(multiply)
 
         if (mode == "short"):
             print eq_tex + '\n'
             print result_tex + '\n'
             print error_tex + '\n'
         elif (mode == "default"):
-            try:
-                import IPython.display
-                pdisplay(eq_tex)
-                pdisplay(result_tex)
-                pdisplay(error_tex)
-            except:
+            from maabara.latex import ipython_display
+            display = ipython_display()
+            if (display is not None):
+                for tex in (eq_tex, result_tex, error_tex):
+                    display.display(display.Math(tex))
+                    print tex + '\n'
+            else:
                 logging.warn('Could not import IPython.display to render Latex')
         else:
             raise ValueError('Invalid Mode')
             
         return self.ufloat
 
+    def latex(self, multiply = "dot"):
+        """
+        
+        Get Latex markup of the results of symbolic error propagation
+        
+        Parameters
+        ----------
+        multiply : string, optional
+            See :func:`~maabara.uncertainty.Sheet.print_result`
+            
+        Returns
+        -------
+        out : string equation, string result, string error equation
+        
+        """
+        if (self.changed):
+            self.run()
+        
+        from maabara.latex import format_ufloat
+        result_tex = format_ufloat(self.nominal, self.deviation)
+        if (self.name != ""):
+            result_tex = self.name + "=" + result_tex
+
+        aliases = tuple((var[0], var[3]) for var in self.data if len(var) == 4 and var[3] != False)
+        eq_tex, error_tex = _equation_tex(self.eq_expr, self.err_expr, aliases, multiply)
+        
+        if (self.name != ""):
+            eq_tex = self.name + "=" + eq_tex
+            error_tex = "\sigma_{" + self.name + "}" + "=" + error_tex
+        
+        return eq_tex, result_tex, error_tex
+    
+    def _state(self, multiply = "dot"):
+        # everything the markup depends on, None if not hashable
+        try:
+            state = (self.equation, self.name, multiply, 
+                     tuple([tuple(var) for var in self.data]))
+            hash(state)
+        except TypeError:
+            return None
+        
+        return state
+    
+    def _gather(self, multiply = "dot"):
+        # gather environment of equation, result and error, cached until the sheet changes
+        state = self._state(multiply)
+        if (state is None or self.rendered[0] != state):
+            eq_tex, result_tex, error_tex = self.latex(multiply)
+            self.rendered = (state, '\\begin{gather*}\n' + eq_tex + '\\\\\n' + result_tex 
+                             + '\\\\\n' + error_tex + '\n\\end{gather*}\n')
+        
+        return self.rendered[1]
+    
+    def _repr_latex_(self):
+        return self._gather()
+
     def p(self,mode = "default", multiply = "dot"):
         """
         
@@ -420,13 +500,18 @@ class Sheet(object):
             out : mixed
             
         """
-        self.run()
+        if (self.changed):
+            self.run()
         
         if (mode.find("tex",0,3) != -1):
-        	tex = '{:L}'.format(self.ufloat)
+        	from maabara.latex import format_ufloat
+        	tex = format_ufloat(self.nominal, self.deviation, '{:L}')
         	if (str.find(mode,"tex:") == 0):
         		tex = mode[4:] + "=" + tex
-        	display(Math(tex))
+        	from maabara.latex import ipython_display
+        	display = ipython_display()
+        	if (display is not None):
+        		display.display(display.Math(tex))
         	print tex
         	return tex
         elif (mode == "ufloat"):
@@ -443,19 +528,22 @@ class Sheet(object):
 
         return False;
 
-    def batch(self,data, fields, mode = "default"):
+    def batch(self,data, fields = None, mode = "default"):
         """
         
         Batch process a set of values.
 
         Parameters
         ----------
-        data : array_like NxM or tuple of array_like
+        data : array_like NxM, tuple of array_like or Dataset
             A tuple will be stacked to columns. Columns represent 
             different variables indexed by ``fields``. Rows will be iterated.
+            A :class:`~maabara.data.Dataset` provides its columns by name.
         fields : string
             List of columns fields divided by ``|``. Deviations columns 
             must be suffix by ``%``. Use ``*`` to ignore a column form ``data``     
+            For a Dataset the value fields to use, their deviation 
+            columns are added automatically. Defaults to all columns.
         mode : {'default', 'ufloat', or 'exact'}, optional
             Specify ``return`` type
             
@@ -476,6 +564,11 @@ class Sheet(object):
         batch method. The batch method will automaticly use the values 
         if not given by the data array. See example below.
         
+        Rows are not logged one by one. Afterwards ``diagnostics`` holds 
+        the ``status`` of every row (``ok``, ``missing`` value or 
+        ``nonfinite`` result) and the ``counts`` per status, problems 
+        are summarized in one log line.
+        
         Examples
         --------
         Retrieve a computation object and set equation
@@ -499,8 +592,19 @@ class Sheet(object):
         >>> stack.batch(data, '*|x|x%', 'ufloat')  # rerun computation ignoring first data column
         array([[1.0+/-0.30000000000000004],
                [8.0+/-1.7999999999999998]], dtype=object)
+        
+        Find failed rows
+        
+        >>> stack.batch([[1., 0.1], [np.nan, 0.1]], 'x|x%')
+        >>> stack.diagnostics['status'] != 'ok'
+        array([False,  True])
         """
         
+        from maabara.data import Dataset
+        if (isinstance(data, Dataset)):
+            fields = data.fields(fields)
+            data = data.array(fields)
+        
         data = np.array(data);
 
         if(isinstance(data,tuple)):
@@ -511,7 +615,7 @@ class Sheet(object):
     		data = np.column_stack((data[:],))
     	
     	#reset messages
-    	self.messages = []
+    	self.messages = set()
     
         fields = str.split(fields.strip(),"|")
 
@@ -524,6 +628,28 @@ class Sheet(object):
         else:
             result = np.zeros([len(data),2])
             
+        # problems are counted per row and reported once
+        status = []
+        self.quiet = True
+        try:
+            self._batch_rows(data, fields, mode, result, status)
+        finally:
+            self.quiet = False
+        
+        status = np.array(status, dtype=str)
+        counts = dict((kind, int(np.sum(status == kind))) for kind in ('ok', 'missing', 'nonfinite'))
+        self.diagnostics = {'status': status, 'counts': counts}
+        
+        if (counts['missing'] > 0 or counts['nonfinite'] > 0):
+            logging.warning("Batch of %d rows: %d with missing values, %d non-finite" 
+                            % (len(status), counts['missing'], counts['nonfinite']))
+        
+        if (mode == 'ufloat'):
+            return np.array(result)
+        
+        return result
+    
+    def _batch_rows(self, data, fields, mode, result, status):
         i = 0
         for line in data:
             for field in fields:
@@ -557,21 +683,15 @@ class Sheet(object):
                 result[i][0] = nominal
                 result[i][1] = deviation
             
+            status.append(self.status)
             i += 1
-        
-        if (mode == 'ufloat'):
-            return np.array(result)
-        
-        return result
     
     def _msg(self, message, mode = 'default'):
         # avoid multiple messages
-    	try:
-            self.messages.index(message)
+        if (message in self.messages):
             return
-    	except:
-            self.messages.append(message)
-    	
+        self.messages.add(message)
+        
     	if (mode == 'warning'):
             logging.warning(message)
         else:
@@ -585,4 +705,136 @@ class Sheet(object):
             except ValueError:
                 continue
             return row, column
-        return -1
\ No newline at end of file
+        return -1
+
+class Report(object):
+    """
+    
+    Latex report of many Sheets
+    
+    Sheets share the derivation and formatting caches. When the report 
+    is written again, only Sheets whose equation or values changed are 
+    rendered again.
+
+    Parameters
+    ----------
+    sheets : list of Sheets, optional
+        See :func:`~maabara.uncertainty.Report.add`
+    multiply : string, optional
+        See :func:`~maabara.uncertainty.Sheet.print_result`
+        
+    Examples
+    --------
+    >>> report = ma.uncertainty.Report()
+    >>> report.add(ma.uncertainty.Sheet('a*x', 'U'))
+    >>> report.export('results.tex')
+    '\\input{results.tex}'
+    
+    """
+
+    def __init__(self, sheets = [], multiply = "dot"):
+        self.multiply = multiply
+        self.reset()
+        for sheet in sheets:
+            self.add(sheet)
+    
+    def reset(self):
+        """
+        
+        Remove all Sheets
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+        """
+        self.sheets = []
+        
+        return True
+    
+    def add(self, sheet):
+        """
+        
+        Add a Sheet to the report
+        
+        Parameters
+        ----------
+        sheet : Sheet
+            The Sheet is kept by reference, later changes are 
+            included when the report is written again
+        
+        Returns
+        -------
+        out : Sheet
+            The added Sheet
+        """
+        self.sheets.append(sheet)
+        
+        return sheet
+    
+    def write(self, stream):
+        """
+        
+        Write Latex markup of all Sheets to a file-like object
+        
+        Every Sheet is written as ``gather*`` environment holding 
+        its equation, result and error equation.
+        
+        Parameters
+        ----------
+        stream : file-like
+            Object with a ``write`` method
+        
+        Returns
+        -------
+        out : boolean
+            True on success.
+        """
+        for sheet in self.sheets:
+            stream.write(sheet._gather(self.multiply))
+        
+        return True
+    
+    def latex(self):
+        """
+        
+        Get Latex markup of all Sheets
+        
+        Returns
+        -------
+        out : string
+        """
+        import StringIO
+        
+        result = StringIO.StringIO()
+        self.write(result)
+
+        return result.getvalue()
+    
+    def export(self, file):
+        """
+        
+        Saves Latex markup of all Sheets to file
+        
+        Parameters
+        ----------
+        file : string
+            Filename
+        
+        Returns
+        -------
+        out : mixed
+            Latex ``\input`` command or ``False`` on failure
+        
+        """
+        try:
+            text_file = open(file, "w")
+        except IOError:
+            return False
+        
+        try:
+            self.write(text_file)
+        finally:
+            text_file.close()
+
+        return '\\input{' + file + '}'
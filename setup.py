@@ -24,5 +24,8 @@ setup(name='maabara',
       install_requires=[
           'numpy','sympy','uncertainties','scipy'
       ],
+      entry_points={
+          'console_scripts': ['maabara = maabara.__main__:main'],
+      },
       include_package_data=True,
       zip_safe=False)
\ No newline at end of file